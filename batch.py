@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from npc_metrics import GenerationTrace, log_trace
+
+DEFAULT_CONCURRENCY = 8
+
+FIELD_ALIASES = {
+    "race": "race",
+    "class": "char_class",
+    "char_class": "char_class",
+    "subclass": "subclass",
+    "level": "level",
+    "role": "role_description",
+    "role_description": "role_description",
+    "include_spells": "include_spells",
+}
+
+
+def parse_bool(value, default=True):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def read_spec_rows(path):
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield row
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})")
+
+
+def normalize_spec(row):
+    if not isinstance(row, dict):
+        raise ValueError("each request must be an object")
+
+    spec = {}
+    for key, value in row.items():
+        field = FIELD_ALIASES.get(str(key).strip().lower())
+        if field is not None:
+            spec[field] = value
+
+    race = str(spec.get("race") or "").strip()
+    char_class = str(spec.get("char_class") or "").strip()
+    if not race or not char_class:
+        raise ValueError("race and class are required")
+
+    try:
+        level = int(spec.get("level") or 1)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid level: {spec.get('level')!r}")
+    if level < 1 or level > 20:
+        raise ValueError("level must be between 1 and 20")
+
+    return {
+        "race": race,
+        "char_class": char_class,
+        "subclass": str(spec.get("subclass") or "").strip(),
+        "level": level,
+        "include_spells": parse_bool(spec.get("include_spells")),
+        "role_description": str(spec.get("role_description") or "").strip(),
+    }
+
+
+# Rows may ask for several NPCs via "count"; every copy after the first
+# bypasses the statblock cache so the copies are distinct NPCs.
+def load_specs(path):
+    jobs = []
+    for row_no, row in enumerate(read_spec_rows(path), start=1):
+        try:
+            spec = normalize_spec(row)
+            count = int(row.get("count") or 1)
+        except ValueError as e:
+            jobs.append((row_no, row, None, 0, str(e)))
+            continue
+        for copy in range(max(count, 1)):
+            jobs.append((row_no, row, spec, copy, None))
+    return jobs
+
+
+async def run_batch(
+    jobs,
+    output_path,
+    generate,
+    concurrency=DEFAULT_CONCURRENCY,
+    fresh=False,
+    combined=None,
+    timeout=None
+):
+    total = len(jobs)
+    done = 0
+    failed = 0
+    prompt_tokens = 0
+    cached_tokens = 0
+    pending = iter(enumerate(jobs))
+    started = time.perf_counter()
+
+    with open(output_path, "w", encoding="utf-8") as out:
+
+        def write_record(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def worker():
+            nonlocal done, failed, prompt_tokens, cached_tokens
+            for index, (row_no, row, spec, copy, error) in pending:
+                record = {"index": index, "row": row_no, "request": row}
+                if error is None:
+                    trace = GenerationTrace(mode="batch")
+                    try:
+                        # wait_for cancels the generation task, which
+                        # aborts its in-flight requests.
+                        data, formatted = await asyncio.wait_for(
+                            generate(
+                                spec["race"],
+                                spec["char_class"],
+                                spec["subclass"],
+                                spec["level"],
+                                spec["include_spells"],
+                                spec["role_description"],
+                                fresh or copy > 0,
+                                combined=combined,
+                                trace=trace
+                            ),
+                            timeout
+                        )
+                    except asyncio.TimeoutError:
+                        error = f"Cancelled: generation timed out after {timeout:g}s"
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                    log_trace(trace, error)
+                    tokens = trace.tokens()
+                    prompt_tokens += tokens["prompt_tokens"]
+                    cached_tokens += tokens["cached_tokens"]
+                    if error is None:
+                        record["npc"] = data if isinstance(data, dict) else None
+                        record["statblock"] = formatted
+
+                if error is not None:
+                    record["error"] = error
+                    failed += 1
+
+                write_record(record)
+                done += 1
+                status = "error" if error is not None else "ok"
+                print(f"[{done}/{total}] row {row_no}: {status}", file=sys.stderr)
+
+        workers = [worker() for _ in range(max(1, min(concurrency, total)))]
+        await asyncio.gather(*workers)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Generated {done - failed}/{total} NPCs in {elapsed:.1f}s "
+        f"({failed} failed) -> {output_path}",
+        file=sys.stderr
+    )
+    if prompt_tokens:
+        print(
+            f"Prompt cache: {cached_tokens}/{prompt_tokens} prompt tokens cached "
+            f"({cached_tokens / prompt_tokens:.0%})",
+            file=sys.stderr
+        )
+    return failed
+
+
+def main(argv, generate):
+    parser = argparse.ArgumentParser(
+        prog="Main.py batch",
+        description="Generate many NPCs from a JSONL or CSV spec file."
+    )
+    parser.add_argument("spec", help="JSONL or CSV file with race/class/subclass/level/role columns")
+    parser.add_argument("-o", "--output", help="output JSONL file (default: <spec>.npcs.jsonl)")
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"maximum number of requests in flight (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument("--fresh", action="store_true", help="skip the statblock cache")
+    parser.add_argument(
+        "--combined",
+        action="store_true",
+        default=None,
+        help="request spell summaries inside the statblock (one call per NPC)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="give up on an NPC after this many seconds (default: no limit)"
+    )
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.spec)[0] + ".npcs.jsonl"
+
+    try:
+        jobs = load_specs(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"Could not read spec file: {e}", file=sys.stderr)
+        return 1
+
+    if not jobs:
+        print("Spec file contains no requests.", file=sys.stderr)
+        return 1
+
+    failed = asyncio.run(
+        run_batch(
+            jobs, output, generate, args.concurrency, args.fresh, args.combined,
+            args.timeout
+        )
+    )
+    return 1 if failed else 0
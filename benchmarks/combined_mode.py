@@ -0,0 +1,83 @@
+"""Compare the two-call pipeline with the combined single-request mode.
+
+Run from the repository root (needs OPENAI_API_KEY, makes real requests):
+
+    python -m benchmarks.combined_mode --runs 5
+
+Every generation uses an empty temporary cache, so both modes pay for all
+of their requests. The NPC library and metrics log go to the same
+temporary directory, not the user's.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import npc_core
+
+SPELLCASTERS = [
+    ("Elf", "Wizard", "Evocation", 5),
+    ("Human", "Cleric", "Life Domain", 3),
+    ("Tiefling", "Warlock", "Fiend", 7),
+    ("Gnome", "Sorcerer", "Wild Magic", 9),
+    ("Half-Elf", "Bard", "College of Lore", 4),
+]
+
+
+def run_mode(combined, runs, cache_dir):
+    latencies = []
+    before = npc_core.usage_totals()
+
+    for i in range(runs):
+        race, char_class, subclass, level = SPELLCASTERS[i % len(SPELLCASTERS)]
+        npc_core.configure_caches(
+            os.path.join(cache_dir, f"{'combined' if combined else 'two-call'}-{i}.sqlite3")
+        )
+        started = time.perf_counter()
+        npc_core.generate_npc(
+            race, char_class, subclass, level,
+            include_spells=True,
+            combined=combined
+        )
+        latencies.append(time.perf_counter() - started)
+
+    after = npc_core.usage_totals()
+    usage = {key: after[key] - before[key] for key in after}
+    return latencies, usage
+
+
+def report(label, latencies, usage, runs):
+    print(
+        f"{label:<10} "
+        f"median {statistics.median(latencies):6.2f}s  "
+        f"mean {statistics.mean(latencies):6.2f}s  "
+        f"max {max(latencies):6.2f}s  "
+        f"requests/NPC {usage['requests'] / runs:4.1f}  "
+        f"prompt tok/NPC {usage['prompt_tokens'] / runs:7.0f}  "
+        f"completion tok/NPC {usage['completion_tokens'] / runs:7.0f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if not npc_core.has_api_key():
+        print("OPENAI_API_KEY is required for this benchmark.", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["NPC_GENERATOR_HOME"] = cache_dir
+        two_call = run_mode(False, args.runs, cache_dir)
+        combined = run_mode(True, args.runs, cache_dir)
+
+    report("two-call", *two_call, args.runs)
+    report("combined", *combined, args.runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Import-time budget for the GUI-free core.
+
+Run from the repository root:
+
+    python -m benchmarks.import_time
+
+Also measures the imports of "Main.py batch --help", i.e. what a batch
+job pays before it starts. Exits with status 1 when either takes longer
+than the budget or pulls in tkinter / the OpenAI SDK.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULE = "npc_core"
+COMMAND = ("Main.py", "batch", "--help")
+IMPORT_TIME_BUDGET_MS = 50.0
+# A batch job needs asyncio (which pulls in ssl) on top of npc_core.
+COMMAND_BUDGET_MS = 100.0
+FORBIDDEN_MODULES = ("tkinter", "openai", "httpx")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_once(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def parse_importtime(stderr):
+    # (module, cumulative ms) for each top-level import; nested imports
+    # are indented and already counted in their parent's cumulative time.
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        if not name.startswith(" "):
+            yield name, int(parts[1]) / 1000.0
+
+
+def imported_modules(stderr):
+    names = set()
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3:
+            names.add(parts[2].strip())
+    return names
+
+
+def run_importtime(args):
+    env = dict(os.environ)
+    # Without a key "Main.py batch" stops before reaching the batch module.
+    env.setdefault("OPENAI_API_KEY", "import-time-benchmark")
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True
+    ).stderr
+
+
+def measure_command_once(command, startup):
+    """Import time of running command, minus interpreter startup imports."""
+    return sum(
+        ms for name, ms in parse_importtime(run_importtime(command))
+        if name not in startup
+    )
+
+
+def loaded_forbidden_modules(module):
+    code = (
+        f"import sys, {module}\n"
+        f"print(' '.join(m for m in {FORBIDDEN_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--command-budget-ms", type=float, default=COMMAND_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    # The first run may have to write .pyc files; do not count it.
+    measure_once(MODULE)
+    samples = [measure_once(MODULE) for _ in range(args.runs)]
+    median = statistics.median(samples)
+
+    print(
+        f"import {MODULE}: median {median:.1f} ms, "
+        f"min {min(samples):.1f} ms, max {max(samples):.1f} ms "
+        f"(budget {args.budget_ms:.0f} ms, {args.runs} runs)"
+    )
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: {MODULE} import exceeds the budget")
+        failed = True
+
+    forbidden = loaded_forbidden_modules(MODULE)
+    if forbidden:
+        print(f"FAIL: importing {MODULE} loads {', '.join(forbidden)}")
+        failed = True
+
+    command = " ".join(COMMAND)
+    startup = {name for name, _ in parse_importtime(run_importtime(["-c", "pass"]))}
+    measure_command_once(COMMAND, startup)
+    samples = [measure_command_once(COMMAND, startup) for _ in range(args.runs)]
+    median = statistics.median(samples)
+    print(
+        f"{command}: median {median:.1f} ms of imports, "
+        f"min {min(samples):.1f} ms, max {max(samples):.1f} ms "
+        f"(budget {args.command_budget_ms:.0f} ms)"
+    )
+    if median > args.command_budget_ms:
+        print(f"FAIL: {command} imports exceed the budget")
+        failed = True
+
+    loaded = imported_modules(run_importtime(COMMAND))
+    forbidden = [m for m in FORBIDDEN_MODULES if m in loaded]
+    if forbidden:
+        print(f"FAIL: {command} loads {', '.join(forbidden)}")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
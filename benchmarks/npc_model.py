@@ -0,0 +1,110 @@
+"""Compare the compact Npc model with plain statblock dicts.
+
+Run from the repository root (no API key needed):
+
+    python -m benchmarks.npc_model --count 10000
+
+Builds the same NPCs as dicts (json.loads, like the library and batch
+files) and as Npc objects, then reports memory per NPC, render throughput
+and the JSON round trip. Npc.from_json() validates while it loads and
+to_json() builds a dict before dumping, so both are slower than bare
+json.loads/json.dumps; those lines are for reference and not checked.
+Exits with status 1 when the two paths render different text or the
+model is not smaller than the dicts.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from npc_core import CLASS_TO_SUBCLASSES, RACES, format_statblock
+from npc_model import Npc
+from rules import offline_statblock
+
+SPELLS = ["Fire Bolt", "Shield", "Magic Missile", "Misty Step", "Counterspell",
+          "Fireball", "Cure Wounds", "Bless", "Hold Person", "Spiritual Weapon"]
+SKILLS = ["Arcana +6", "Perception +4", "Stealth +5", "Insight +3", "History +6"]
+
+
+def sample_records(count, seed):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        char_class = rng.choice(list(CLASS_TO_SUBCLASSES))
+        data = offline_statblock(
+            rng.choice(RACES),
+            char_class,
+            rng.choice(CLASS_TO_SUBCLASSES[char_class]),
+            rng.randint(1, 20)
+        )
+        data["name"] = f"NPC {i}"
+        data["spells"] = rng.sample(SPELLS, rng.randint(0, 6))
+        data["skills"] = rng.sample(SKILLS, 3)
+        data["features"] = [f"Feature {i}-{n}" for n in range(3)]
+        records.append(json.dumps(data))
+    return records
+
+
+def measure_memory(build, records):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(text) for text in records]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return kept, used / len(records)
+
+
+def per_second(func, items, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return repeat * len(items) / (time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    records = sample_records(args.count, args.seed)
+
+    dicts, dict_bytes = measure_memory(json.loads, records)
+    npcs, npc_bytes = measure_memory(Npc.from_json, records)
+
+    failed = False
+    for data, npc in zip(dicts, npcs):
+        if format_statblock(data) != npc.format():
+            print(f"FAIL: {data['name']} renders differently")
+            failed = True
+            break
+
+    print(f"{args.count} NPCs")
+    print(f"{'memory/NPC':<24}{'dict':>12}{'Npc':>12}")
+    print(f"{'':<24}{dict_bytes:>10.0f} B{npc_bytes:>10.0f} B")
+    print(f"{'renders/s':<24}"
+          f"{per_second(format_statblock, dicts, args.repeat):>12,.0f}"
+          f"{per_second(Npc.format, npcs, args.repeat):>12,.0f}")
+    print(f"{'loads/s (from JSON)':<24}"
+          f"{per_second(json.loads, records, args.repeat):>12,.0f}"
+          f"{per_second(Npc.from_json, records, args.repeat):>12,.0f}")
+    print(f"{'dumps/s (to JSON)':<24}"
+          f"{per_second(json.dumps, dicts, args.repeat):>12,.0f}"
+          f"{per_second(Npc.to_json, npcs, args.repeat):>12,.0f}")
+
+    if any(Npc.from_json(npc.to_json()) != npc for npc in npcs):
+        print("FAIL: JSON round trip changed an NPC")
+        failed = True
+    if npc_bytes >= dict_bytes:
+        print("FAIL: Npc uses no less memory than the dict")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
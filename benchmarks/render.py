@@ -0,0 +1,109 @@
+"""Throughput check for the statblock renderers.
+
+Run from the repository root (no API key needed):
+
+    python -m benchmarks.render --count 5000
+
+Renders the same NPCs one at a time with Npc.format() and in every format
+with render_many() into memory, and reports NPCs per second next to
+format_statblock() on the equivalent dicts in the same run. Exits with
+status 1 when the text output no longer matches format_statblock(), when
+either text rate is below --min-text-speedup times that dict baseline, or
+when another format is below --min-ratio times it.
+
+The floors are relative and every path is timed in turn with the
+baseline, so they mean the same on any machine. When they were set, text
+measured 1.4-1.7x the baseline and the other formats 0.7x (columns) to
+1.0x.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+
+from benchmarks.npc_model import sample_records
+from npc_core import format_statblock
+from npc_model import Npc
+from npc_render import RENDER_FORMATS, get_template, render, render_many
+
+# Minimum rates as a multiple of format_statblock() on dicts.
+MIN_TEXT_SPEEDUP = 1.1
+MIN_RATIO = 0.5
+
+
+def best_rates(funcs, count, repeat):
+    # Best of several runs; slower runs are mostly scheduler noise. The
+    # functions take turns, so a slow stretch of the machine hits all of
+    # them and the ratios between them stay put.
+    best = [float("inf")] * len(funcs)
+    for _ in range(repeat):
+        for index, func in enumerate(funcs):
+            started = time.perf_counter()
+            func()
+            best[index] = min(best[index], time.perf_counter() - started)
+    return [count / seconds for seconds in best]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-text-speedup", type=float, default=MIN_TEXT_SPEEDUP)
+    parser.add_argument("--min-ratio", type=float, default=MIN_RATIO)
+    args = parser.parse_args(argv)
+
+    dicts = [json.loads(text) for text in sample_records(args.count, args.seed)]
+    npcs = [Npc.from_dict(data) for data in dicts]
+
+    compile_ms = {}
+    for render_format in RENDER_FORMATS:
+        started = time.perf_counter()
+        get_template(render_format)
+        compile_ms[render_format] = (time.perf_counter() - started) * 1000
+
+    failed = False
+    for data, npc in zip(dicts, npcs):
+        if render(npc) != format_statblock(data):
+            print(f"FAIL: text renders {data['name']} differently")
+            failed = True
+            break
+
+    # label -> (render every NPC once, floor, note)
+    candidates = {
+        "Npc.format() (text)": (
+            lambda: [npc.format() for npc in npcs], args.min_text_speedup, ""
+        ),
+    }
+    for render_format in RENDER_FORMATS:
+        candidates[render_format] = (
+            lambda render_format=render_format: render_many(
+                npcs, io.StringIO(), render_format
+            ),
+            args.min_text_speedup if render_format == "text" else args.min_ratio,
+            f", built in {compile_ms[render_format]:.2f} ms",
+        )
+
+    baseline, *rates = best_rates(
+        [lambda: [format_statblock(data) for data in dicts]]
+        + [func for func, _, _ in candidates.values()],
+        args.count,
+        args.repeat
+    )
+    print(f"{args.count} NPCs, best of {args.repeat}")
+    print(f"{'format_statblock (dict)':<26}{baseline:>12,.0f} NPCs/s")
+    for (label, (_, floor, note)), rate in zip(candidates.items(), rates):
+        status = "ok" if rate >= baseline * floor else "SLOW"
+        print(
+            f"{label:<26}{rate:>12,.0f} NPCs/s   {rate / baseline:.2f}x"
+            f" (floor {floor:.2f}x{note}) {status}"
+        )
+        if status != "ok":
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
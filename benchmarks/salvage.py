@@ -0,0 +1,70 @@
+"""Regression and speed check for the tolerant statblock parser.
+
+Run from the repository root (no API key needed):
+
+    python -m benchmarks.salvage
+
+Every case in salvage_corpus.jsonl holds a clean, noisy or truncated model
+response together with the object and completeness flag salvage_object
+must return. Exits with status 1 when a case no longer matches or the
+slowest case exceeds the per-call budget.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from json_stream import salvage_object
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "salvage_corpus.jsonl")
+PER_CALL_BUDGET_US = 500.0
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def time_case(text, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        salvage_object(text)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--budget-us", type=float, default=PER_CALL_BUDGET_US)
+    args = parser.parse_args(argv)
+
+    failed = False
+    slowest = 0.0
+    for case in load_corpus(args.corpus):
+        data, complete = salvage_object(case["text"])
+        ok = data == case["expected"] and complete == case["complete"]
+        per_call = time_case(case["text"], args.iterations)
+        slowest = max(slowest, per_call)
+
+        status = "ok" if ok else "FAIL"
+        print(
+            f"{status:<4} {case['name']:<36} {len(case['text']):5d} chars "
+            f"{per_call:8.1f} us/call"
+        )
+        if not ok:
+            print(f"     expected {case['expected']!r} complete={case['complete']}")
+            print(f"     got      {data!r} complete={complete}")
+            failed = True
+
+    print(f"slowest case {slowest:.1f} us/call (budget {args.budget_us:.0f} us)")
+    if slowest > args.budget_us:
+        print("FAIL: salvage_object exceeds the per-call budget")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
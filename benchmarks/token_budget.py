@@ -0,0 +1,187 @@
+"""Token and cost budget of the full and compact statblock requests.
+
+Run from the repository root:
+
+    python -m benchmarks.token_budget
+    python -m benchmarks.token_budget --live --runs 2
+
+Every NPC in token_budget_specs.jsonl is built twice: with the long prompt
+and no output cap ("baseline", NPC_COMPACT_PROMPT=0 NPC_OUTPUT_CAPS=0) and
+with the compact prompt and level-dependent max_tokens ("budget"). Without
+--live (no API key needed) the prompt size is estimated from the request
+text. --live generates every NPC with both variants (needs OPENAI_API_KEY,
+makes real requests, empty temporary caches; the NPC library and metrics
+log go to the same temporary directory) and reports measured tokens,
+latency and cost. Prices are per million tokens.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import npc_core
+from rules import compute_mechanics
+
+SPECS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "token_budget_specs.jsonl")
+
+# Rough size of an English/JSON token, for the offline estimate.
+CHARS_PER_TOKEN = 4
+
+# gpt-4.1-mini list prices, USD per million tokens.
+INPUT_PRICE = 0.40
+OUTPUT_PRICE = 1.60
+
+VARIANTS = (
+    ("baseline", False, False),
+    ("budget", True, True),
+)
+
+
+def load_specs(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def use_variant(compact, caps):
+    npc_core.COMPACT_PROMPT = compact
+    npc_core.OUTPUT_CAPS = caps
+
+
+def build_request(spec):
+    mechanics = None
+    if npc_core.RULES_ENGINE:
+        mechanics = compute_mechanics(
+            spec["race"], spec["char_class"], spec["subclass"], spec["level"]
+        )
+    return npc_core.build_statblock_request(
+        spec["race"],
+        spec["char_class"],
+        spec["subclass"],
+        spec["level"],
+        spec["include_spells"],
+        spec.get("role", ""),
+        npc_core.COMBINED_MODE,
+        mechanics
+    )
+
+
+def estimated_prompt_tokens(request):
+    # The schema in response_format is sent to the model as well.
+    text = "".join(message["content"] for message in request["messages"])
+    if "response_format" in request:
+        text += json.dumps(request["response_format"])
+    return len(text) / CHARS_PER_TOKEN
+
+
+def cost(prompt_tokens, completion_tokens, input_price, output_price):
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+
+def offline_report(specs):
+    print(f"Statblock request per NPC (prompt ~{CHARS_PER_TOKEN} chars/token, estimated)")
+    print(f"{'':<44}" + "".join(f"{name:>18}" for name, _, _ in VARIANTS))
+    totals = {name: 0.0 for name, _, _ in VARIANTS}
+    for spec in specs:
+        cells = []
+        for name, compact, caps in VARIANTS:
+            use_variant(compact, caps)
+            request = build_request(spec)
+            tokens = estimated_prompt_tokens(request)
+            totals[name] += tokens
+            cap = request.get("max_tokens")
+            cells.append(f"{tokens:>8.0f} / {cap if cap else '-':>5}")
+        label = f"L{spec['level']} {spec['race']} {spec['char_class']}"
+        if spec["include_spells"]:
+            label += " (spells)"
+        print(f"{label:<44}" + "".join(f"{cell:>18}" for cell in cells))
+
+    baseline, budget = (totals[name] for name, _, _ in VARIANTS)
+    print(f"{'prompt tokens (all NPCs)':<44}{baseline:>18.0f}{budget:>18.0f}")
+    print(f"prompt tokens saved: {(1 - budget / baseline) * 100:.0f}%  (columns: prompt / max_tokens)")
+
+
+def run_variant(specs, runs, cache_dir, name):
+    latencies = []
+    before = npc_core.usage_totals()
+    for run in range(runs):
+        for index, spec in enumerate(specs):
+            npc_core.configure_caches(
+                os.path.join(cache_dir, f"{name}-{run}-{index}.sqlite3")
+            )
+            started = time.perf_counter()
+            npc_core.generate_npc(
+                spec["race"],
+                spec["char_class"],
+                spec["subclass"],
+                spec["level"],
+                include_spells=spec["include_spells"],
+                role_description=spec.get("role", "")
+            )
+            latencies.append(time.perf_counter() - started)
+    after = npc_core.usage_totals()
+    return latencies, {key: after[key] - before[key] for key in after}
+
+
+def live_report(specs, runs, input_price, output_price):
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["NPC_GENERATOR_HOME"] = cache_dir
+        for name, compact, caps in VARIANTS:
+            use_variant(compact, caps)
+            results[name] = run_variant(specs, runs, cache_dir, name)
+
+    count = len(specs) * runs
+    print(f"\nMeasured, {count} NPCs per variant")
+    print(
+        f"{'':<10}{'median':>9}{'mean':>9}{'req/NPC':>9}"
+        f"{'prompt/NPC':>12}{'compl./NPC':>12}{'$/1000 NPCs':>13}"
+    )
+    summary = {}
+    for name, (latencies, usage) in results.items():
+        dollars = cost(
+            usage["prompt_tokens"], usage["completion_tokens"], input_price, output_price
+        ) / count * 1000
+        summary[name] = (statistics.mean(latencies), dollars)
+        print(
+            f"{name:<10}"
+            f"{statistics.median(latencies):>8.2f}s"
+            f"{statistics.mean(latencies):>8.2f}s"
+            f"{usage['requests'] / count:>9.1f}"
+            f"{usage['prompt_tokens'] / count:>12.0f}"
+            f"{usage['completion_tokens'] / count:>12.0f}"
+            f"{dollars:>13.3f}"
+        )
+
+    (base_latency, base_cost), (latency, dollars) = (
+        summary[name] for name, _, _ in VARIANTS
+    )
+    if base_cost:
+        print(f"cost saved: {(1 - dollars / base_cost) * 100:.0f}%", end="  ")
+    print(f"mean latency saved: {(1 - latency / base_latency) * 100:.0f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--specs", default=SPECS_PATH)
+    parser.add_argument("--live", action="store_true", help="make real requests")
+    parser.add_argument("--runs", type=int, default=1, help="passes over the specs with --live")
+    parser.add_argument("--input-price", type=float, default=INPUT_PRICE)
+    parser.add_argument("--output-price", type=float, default=OUTPUT_PRICE)
+    args = parser.parse_args(argv)
+
+    if args.live and not npc_core.has_api_key():
+        print("OPENAI_API_KEY is required for --live.", file=sys.stderr)
+        return 1
+
+    specs = load_specs(args.specs)
+    offline_report(specs)
+    if args.live:
+        live_report(specs, args.runs, args.input_price, args.output_price)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
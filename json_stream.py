@@ -0,0 +1,220 @@
+import json
+import re
+
+
+class IncrementalObjectParser:
+    """Parse a streamed JSON object and report members as soon as they close.
+
+    feed() returns a list of events:
+
+    - ("field", key, value) when a top-level member is complete
+    - ("item", key, value) when an element of a top-level array is complete
+
+    Anything before the first "{" (markdown fences, prose) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.finished = False
+
+        self.expect_key = False
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+
+        self.array_key = None
+        self.item_start = None
+
+    def feed(self, chunk):
+        events = []
+        if self.finished or not chunk:
+            return events
+
+        self.buffer += chunk
+        buf = self.buffer
+        i = self.pos
+
+        while i < len(buf):
+            ch = buf[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.key = json.loads(buf[self.key_start:i + 1])
+                        self.key_start = None
+                i += 1
+                continue
+
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                    self.expect_key = True
+                i += 1
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expect_key:
+                    self.key_start = i
+                    self.expect_key = False
+            elif ch == ":" and self.depth == 1:
+                self.value_start = i + 1
+            elif ch in "{[":
+                if ch == "[" and self.depth == 1 and self._at_value_start(i):
+                    self.array_key = self.key
+                    self.item_start = i + 1
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 2 and self.array_key is not None:
+                    self._emit_item(buf[self.item_start:i], events)
+                    self.array_key = None
+                    self.item_start = None
+                self.depth -= 1
+                if self.depth == 0:
+                    self._emit_field(buf[self.value_start:i], events)
+                    self.finished = True
+                    i += 1
+                    break
+            elif ch == ",":
+                if self.depth == 1:
+                    self._emit_field(buf[self.value_start:i], events)
+                    self.expect_key = True
+                elif self.depth == 2 and self.array_key is not None:
+                    self._emit_item(buf[self.item_start:i], events)
+                    self.item_start = i + 1
+            i += 1
+
+        self.pos = i
+        return events
+
+    def _at_value_start(self, index):
+        if self.value_start is None:
+            return False
+        return not self.buffer[self.value_start:index].strip()
+
+    def _emit_field(self, text, events):
+        key = self.key
+        self.key = None
+        self.value_start = None
+        if key is None or not text.strip():
+            return
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        events.append(("field", key, value))
+
+    def _emit_item(self, text, events):
+        if not text.strip():
+            return
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        events.append(("item", self.array_key, value))
+
+
+def apply_events(partial, events):
+    for kind, key, value in events:
+        if kind == "item":
+            partial.setdefault(key, []).append(value)
+        else:
+            partial[key] = value
+    return partial
+
+
+# An object start that looks like JSON ("{" followed by a key or "}"),
+# so braces in leading prose are skipped.
+_OBJECT_START = re.compile(r'\{\s*["}]')
+# Strings (group 1 is empty when the string is unterminated) and the
+# structural characters; numbers, literals and whitespace are skipped.
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*(")?|[{}\[\],]')
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def _loads_object(text):
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+
+def salvage_object(text):
+    """Recover a JSON object from noisy or truncated model output.
+
+    Prose and markdown fences around the object are ignored and trailing
+    commas are dropped. If the text ends before the object is closed, the
+    open string is closed and the last member that cannot be completed is
+    cut, then the open arrays and objects are closed.
+
+    Returns (data, complete): data is a dict or None, complete is False
+    when the object had to be cut or closed.
+    """
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        data = _loads_object(stripped)
+        if data is not None:
+            return data, True
+
+    match = _OBJECT_START.search(text)
+    if match is None:
+        return None, False
+    start = match.start()
+
+    closers = []
+    # (end, closers) after each complete member, newest last.
+    checkpoints = []
+    open_string_end = None
+
+    for token in _TOKEN.finditer(text, start):
+        value = token.group()
+        if value == "{":
+            closers.append("}")
+        elif value == "[":
+            closers.append("]")
+        elif value in "}]":
+            if not closers or closers[-1] != value:
+                break
+            closers.pop()
+            if not closers:
+                data = _loads_object(text[start:token.end()])
+                if data is not None:
+                    return data, True
+                break
+            checkpoints.append((token.end(), "".join(reversed(closers))))
+        elif value == ",":
+            checkpoints.append((token.start(), "".join(reversed(closers))))
+        elif token.group(1) is None:
+            open_string_end = token.end()
+
+    candidates = []
+    if open_string_end is not None:
+        candidates.append(
+            text[start:open_string_end] + '"' + "".join(reversed(closers))
+        )
+    else:
+        tail = text[start:].rstrip()
+        # A trailing number or literal may itself be cut short.
+        if tail.endswith(('"', "}", "]")):
+            candidates.append(tail + "".join(reversed(closers)))
+    candidates.extend(
+        text[start:end] + suffix for end, suffix in reversed(checkpoints)
+    )
+
+    for candidate in candidates:
+        data = _loads_object(candidate)
+        if data is not None:
+            return data, False
+    return None, False
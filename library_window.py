@@ -0,0 +1,237 @@
+import threading
+import time
+import tkinter as tk
+from datetime import datetime
+from tkinter import filedialog, ttk
+
+from npc_core import CLASSES, RACES
+from npc_export import export_npcs, format_for_path
+
+SEARCH_DELAY_MS = 150
+EXPORT_POLL_MS = 100
+
+EXPORT_FILETYPES = [
+    ("JSON Lines", "*.jsonl"),
+    ("CSV", "*.csv"),
+    ("Markdown", "*.md"),
+    ("HTML", "*.html"),
+    ("Foundry VTT actors (zip, one file per NPC)", "*.foundry.zip"),
+]
+
+COLUMNS = (
+    ("name", "Name", 180),
+    ("race", "Race", 90),
+    ("class", "Class", 90),
+    ("subclass", "Subclass", 150),
+    ("level", "Level", 50),
+    ("created", "Generated", 120),
+)
+
+
+class LibraryWindow(tk.Toplevel):
+    """Search panel over the NPC library; opening a row shows that NPC."""
+
+    def __init__(self, master, library, on_open, dark=True):
+        super().__init__(master)
+        self.title("NPC Library")
+        self.geometry("720x440")
+        self.minsize(520, 300)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self.library = library
+        self.on_open = on_open
+        self._search_after_id = None
+        self._export_result = None
+
+        filters = ttk.Frame(self, padding=(10, 10, 10, 4), style="App.TFrame")
+        filters.grid(row=0, column=0, sticky="ew")
+        filters.columnconfigure(1, weight=1)
+
+        ttk.Label(filters, text="Search:", style="App.TLabel").grid(
+            row=0, column=0, sticky="w", padx=(0, 5)
+        )
+        self.query_var = tk.StringVar()
+        self.query_entry = ttk.Entry(filters, textvariable=self.query_var)
+        self.query_entry.grid(row=0, column=1, sticky="ew", padx=(0, 10))
+
+        self.race_var = tk.StringVar()
+        self.class_var = tk.StringVar()
+        self.level_var = tk.StringVar()
+        for column, (label, var, values, width) in enumerate(
+            (
+                ("Race:", self.race_var, [""] + RACES, 10),
+                ("Class:", self.class_var, [""] + CLASSES, 10),
+                ("Level:", self.level_var, [""] + [str(n) for n in range(1, 21)], 4),
+            ),
+            start=1
+        ):
+            ttk.Label(filters, text=label, style="App.TLabel").grid(
+                row=0, column=column * 2, sticky="w", padx=(0, 5)
+            )
+            combo = ttk.Combobox(
+                filters,
+                textvariable=var,
+                values=values,
+                width=width,
+                state="readonly",
+                style="App.TCombobox"
+            )
+            combo.grid(row=0, column=column * 2 + 1, sticky="w", padx=(0, 10))
+
+        results = ttk.Frame(self, padding=(10, 0, 10, 0), style="App.TFrame")
+        results.grid(row=1, column=0, sticky="nsew")
+        results.columnconfigure(0, weight=1)
+        results.rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(
+            results,
+            columns=[key for key, _, _ in COLUMNS],
+            show="headings",
+            selectmode="extended"
+        )
+        for key, heading, width in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor="w", stretch=key == "name")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        scrollbar = ttk.Scrollbar(results, orient="vertical", command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        footer = ttk.Frame(self, padding=(10, 4), style="App.TFrame")
+        footer.grid(row=2, column=0, sticky="ew")
+        footer.columnconfigure(0, weight=1)
+
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(
+            footer,
+            textvariable=self.status_var,
+            anchor="w",
+            style="App.TLabel"
+        ).grid(row=0, column=0, sticky="ew")
+
+        self.export_button = ttk.Button(
+            footer,
+            text="Export...",
+            command=self.on_export,
+            style="App.TButton"
+        )
+        self.export_button.grid(row=0, column=1, sticky="e", padx=(10, 0))
+
+        for var in (self.query_var, self.race_var, self.class_var, self.level_var):
+            var.trace_add("write", self.schedule_search)
+        self.tree.bind("<Double-1>", self.on_activate)
+        self.tree.bind("<Return>", self.on_activate)
+        self.query_entry.bind("<Down>", self.focus_results)
+        self.bind("<Escape>", lambda event: self.destroy())
+
+        self.apply_theme(dark)
+        self.search()
+        self.focus_search()
+
+    def apply_theme(self, dark):
+        self.configure(bg="#1E1E1E" if dark else "#FFFFFF")
+
+    def focus_search(self):
+        self.query_entry.focus_set()
+        self.query_entry.select_range(0, tk.END)
+
+    def focus_results(self, event=None):
+        children = self.tree.get_children()
+        if children:
+            self.tree.focus_set()
+            self.tree.selection_set(children[0])
+            self.tree.focus(children[0])
+        return "break"
+
+    def schedule_search(self, *args):
+        # Debounce typing so only the last keystroke runs a query.
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(SEARCH_DELAY_MS, self.search)
+
+    def current_filters(self):
+        level = self.level_var.get()
+        return {
+            "text": self.query_var.get(),
+            "race": self.race_var.get() or None,
+            "char_class": self.class_var.get() or None,
+            "level": int(level) if level else None,
+        }
+
+    def search(self):
+        self._search_after_id = None
+
+        started = time.perf_counter()
+        rows = self.library.search(**self.current_filters())
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.tree.delete(*self.tree.get_children())
+        for npc_id, name, race, char_class, subclass, npc_level, created_at in rows:
+            created = datetime.fromtimestamp(created_at).strftime("%Y-%m-%d %H:%M")
+            self.tree.insert(
+                "",
+                tk.END,
+                iid=str(npc_id),
+                values=(name, race, char_class, subclass, npc_level or "", created)
+            )
+
+        self.status_var.set(
+            f"{len(rows)} shown of {self.library.count()} NPCs "
+            f"(search took {elapsed_ms:.1f} ms). Double-click or Enter to open."
+        )
+
+    def on_export(self):
+        selection = self.tree.selection()
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl",
+            filetypes=EXPORT_FILETYPES,
+            title="Export selected NPCs" if selection else "Export matching NPCs",
+            parent=self
+        )
+        if not file_path:
+            return
+        if format_for_path(file_path) is None:
+            self.status_var.set("Export needs a .jsonl, .csv, .md, .html or .foundry.zip file.")
+            return
+
+        # Selected rows, or every match of the current filters (not just
+        # the rows shown).
+        if selection:
+            records = self.library.iter_npcs(ids=[int(iid) for iid in selection])
+        else:
+            records = self.library.iter_npcs(**self.current_filters())
+
+        self.export_button.configure(state="disabled")
+        self.status_var.set(f"Exporting to {file_path}...")
+        self._export_result = None
+        threading.Thread(
+            target=self._run_export,
+            args=(records, file_path),
+            name="npc-export",
+            daemon=True
+        ).start()
+        self.after(EXPORT_POLL_MS, self.poll_export)
+
+    def _run_export(self, records, file_path):
+        try:
+            count = export_npcs(records, file_path)
+            self._export_result = f"Exported {count} NPCs to {file_path}"
+        except Exception as e:
+            self._export_result = f"Export failed: {e}"
+
+    def poll_export(self):
+        if not self.winfo_exists():
+            return
+        if self._export_result is None:
+            self.after(EXPORT_POLL_MS, self.poll_export)
+            return
+        self.status_var.set(self._export_result)
+        self.export_button.configure(state="normal")
+
+    def on_activate(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            self.on_open(int(selection[0]))
+        return "break"
@@ -0,0 +1,1146 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import tkinter.font as tkfont
+import os
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from npc_core import (
+    CLASS_TO_SUBCLASSES,
+    CLASSES,
+    GENERATION_TIMEOUT,
+    RACES,
+    connection_stats,
+    format_statblock,
+    generate_npc,
+    generate_offline_npc,
+    get_statblock_cache,
+    get_npc_library,
+    has_api_key,
+    random_npc_spec,
+    request_stats,
+    single_flight,
+    warm_up_client,
+)
+from npc_cancel import CancelToken, Cancelled
+from npc_encounter import generate_encounter, offline_encounter, parse_roster
+from npc_metrics import GenerationTrace, log_trace
+from npc_pool import NpcPool
+from npc_render import render_many
+from library_window import LibraryWindow
+from results_window import ResultsWindow
+
+THINKING_MESSAGE = "AI is thinking, please wait..."
+
+GENERATION_WORKERS = 4
+RESULT_POLL_MS = 100
+
+# Saving to these extensions renders the NPC instead of the text view.
+SAVE_RENDER_FORMATS = {".md": "markdown", ".html": "html", ".htm": "html"}
+
+
+class Application(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("DnD NPC Generator")
+
+        self.style = ttk.Style(self)
+        try:
+            self.style.theme_use("clam")
+        except tk.TclError:
+            pass
+
+        self.title_font = tkfont.Font(family="Segoe UI", size=16, weight="bold")
+        self.section_font = tkfont.Font(family="Segoe UI", size=11, weight="bold")
+        self.mono_font = tkfont.Font(family="Consolas", size=10)
+
+        self.geometry("800x650")
+        self.minsize(700, 550)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(3, weight=1)
+
+        self.theme_var = tk.StringVar(value="dark")
+        menubar = tk.Menu(self)
+
+        view_menu = tk.Menu(menubar, tearoff=0)
+        view_menu.add_radiobutton(
+            label="Light",
+            variable=self.theme_var,
+            value="light",
+            command=self.on_theme_changed
+        )
+        view_menu.add_radiobutton(
+            label="Dark",
+            variable=self.theme_var,
+            value="dark",
+            command=self.on_theme_changed
+        )
+        view_menu.add_separator()
+        self.stream_output_var = tk.BooleanVar(value=True)
+        view_menu.add_checkbutton(
+            label="Stream output while generating",
+            variable=self.stream_output_var
+        )
+        self.prefetch_var = tk.BooleanVar(value=os.getenv("NPC_PREFETCH", "") == "1")
+        view_menu.add_checkbutton(
+            label="Prefetch random NPCs in the background",
+            variable=self.prefetch_var,
+            command=self.on_prefetch_changed
+        )
+        menubar.add_cascade(label="View", menu=view_menu)
+
+        library_menu = tk.Menu(menubar, tearoff=0)
+        library_menu.add_command(
+            label="Search NPCs...",
+            accelerator="Ctrl+L",
+            command=self.on_open_library
+        )
+        library_menu.add_command(
+            label="Open batch results...",
+            command=self.on_open_batch_results
+        )
+        library_menu.add_separator()
+        library_menu.add_command(
+            label="Generate encounter...",
+            command=self.on_generate_encounter
+        )
+        menubar.add_cascade(label="Library", menu=library_menu)
+        self.bind("<Control-l>", lambda event: self.on_open_library())
+
+        help_menu = tk.Menu(menubar, tearoff=0)
+        help_menu.add_command(label="About", command=self.on_about)
+        menubar.add_cascade(label="Help", menu=help_menu)
+
+        self.config(menu=menubar)
+
+        self.title_frame = ttk.Frame(self, style="AppTitle.TFrame")
+        self.title_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(8, 4))
+        self.title_frame.columnconfigure(0, weight=1)
+
+        self.title_label = ttk.Label(
+            self.title_frame,
+            text="DnD NPC Generator",
+            font=self.title_font,
+            style="AppTitle.TLabel"
+        )
+        self.title_label.grid(row=0, column=0, sticky="w")
+
+        sep = ttk.Separator(self, orient="horizontal")
+        sep.grid(row=1, column=0, sticky="ew", padx=10, pady=(0, 6))
+
+        self.input_frame = ttk.Frame(self, padding=10, style="App.TFrame")
+        self.input_frame.grid(row=2, column=0, sticky="nsew", padx=10)
+        self.input_frame.columnconfigure(1, weight=1)
+
+        self.race_label = ttk.Label(
+            self.input_frame,
+            text="Race:",
+            style="AppInner.TLabel"
+        )
+        self.race_label.grid(row=0, column=0, sticky="w", padx=2, pady=2)
+        self.race_var = tk.StringVar()
+        self.race_combo = ttk.Combobox(
+            self.input_frame,
+            textvariable=self.race_var,
+            values=RACES,
+            state="readonly",
+            style="App.TCombobox"
+        )
+        self.race_combo.grid(row=0, column=1, sticky="ew", padx=2, pady=2)
+
+        self.class_label = ttk.Label(
+            self.input_frame,
+            text="Class:",
+            style="AppInner.TLabel"
+        )
+        self.class_label.grid(row=1, column=0, sticky="w", padx=2, pady=2)
+        self.class_var = tk.StringVar()
+        self.class_combo = ttk.Combobox(
+            self.input_frame,
+            textvariable=self.class_var,
+            values=CLASSES,
+            state="readonly",
+            style="App.TCombobox"
+        )
+        self.class_combo.grid(row=1, column=1, sticky="ew", padx=2, pady=2)
+        self.class_combo.bind("<<ComboboxSelected>>", self.on_class_changed)
+
+        self.subclass_label = ttk.Label(
+            self.input_frame,
+            text="Subclass (optional):",
+            style="AppInner.TLabel"
+        )
+        self.subclass_label.grid(row=2, column=0, sticky="w", padx=2, pady=2)
+        self.subclass_var = tk.StringVar()
+        self.subclass_combo = ttk.Combobox(
+            self.input_frame,
+            textvariable=self.subclass_var,
+            values=[],
+            state="readonly",
+            style="App.TCombobox"
+        )
+        self.subclass_combo.grid(row=2, column=1, sticky="ew", padx=2, pady=2)
+
+        self.level_label = ttk.Label(
+            self.input_frame,
+            text="Level:",
+            style="AppInner.TLabel"
+        )
+        self.level_label.grid(row=3, column=0, sticky="w", padx=2, pady=2)
+
+        self.level_var = tk.StringVar(value="1")
+
+        self.level_spin = ttk.Spinbox(
+            self.input_frame,
+            from_=1,
+            to=20,
+            textvariable=self.level_var,
+            wrap=True,
+            width=5,
+            style="App.TSpinbox"
+        )
+        self.level_spin.grid(row=3, column=1, sticky="w", padx=2, pady=2)
+
+        self.include_spells_var = tk.BooleanVar(value=True)
+        self.include_spells_cb = ttk.Checkbutton(
+            self.input_frame,
+            text="Include spells",
+            variable=self.include_spells_var,
+            style="App.TCheckbutton"
+        )
+        self.include_spells_cb.grid(row=4, column=0, sticky="w", pady=(5, 5))
+
+        self.fresh_variant_var = tk.BooleanVar(value=False)
+        self.fresh_variant_cb = ttk.Checkbutton(
+            self.input_frame,
+            text="Fresh variant (skip cache)",
+            variable=self.fresh_variant_var,
+            style="App.TCheckbutton"
+        )
+        self.fresh_variant_cb.grid(row=4, column=1, sticky="w", pady=(5, 5))
+
+        self.desc_label = ttk.Label(
+            self.input_frame,
+            text="NPC role / description (optional):",
+            style="AppInner.TLabel"
+        )
+        self.desc_label.grid(row=5, column=0, sticky="nw", padx=2, pady=(5, 2))
+
+        self.description_text = tk.Text(
+            self.input_frame,
+            width=40,
+            height=3,
+            wrap="word",
+            relief="flat"
+        )
+        self.description_text.grid(row=5, column=1, sticky="ew", padx=2, pady=(5, 2))
+
+        buttons_frame = ttk.Frame(self.input_frame, style="App.TFrame")
+        buttons_frame.grid(row=6, column=0, columnspan=2, pady=10, sticky="e")
+
+        self.generate_button = ttk.Button(
+            buttons_frame,
+            text="Generate statblock",
+            command=self.on_generate,
+            style="App.TButton"
+        )
+        self.generate_button.grid(row=0, column=0, padx=(0, 5))
+
+        self.stop_button = ttk.Button(
+            buttons_frame,
+            text="Stop",
+            command=self.on_stop,
+            state="disabled",
+            style="App.TButton"
+        )
+        self.stop_button.grid(row=0, column=1, padx=(0, 5))
+
+        self.random_button = ttk.Button(
+            buttons_frame,
+            text="Random NPC",
+            command=self.on_random,
+            style="App.TButton"
+        )
+        self.random_button.grid(row=0, column=2, padx=(0, 5))
+
+        self.clear_selection_button = ttk.Button(
+            buttons_frame,
+            text="Clear selection",
+            command=self.on_clear_selection,
+            style="App.TButton"
+        )
+        self.clear_selection_button.grid(row=0, column=3)
+
+        self.output_frame = ttk.Frame(self, padding=10, style="App.TFrame")
+        self.output_frame.grid(row=3, column=0, sticky="nsew", padx=10)
+        self.output_frame.columnconfigure(0, weight=1)
+        self.output_frame.rowconfigure(1, weight=1)
+
+        self.output_label = ttk.Label(
+            self.output_frame,
+            text="Result:",
+            font=self.section_font,
+            style="AppInner.TLabel"
+        )
+        self.output_label.grid(row=0, column=0, columnspan=2, sticky="w")
+
+        self.output_text = tk.Text(
+            self.output_frame,
+            width=60,
+            height=20,
+            state="disabled",
+            wrap="word",
+            font=self.mono_font,
+            relief="flat"
+        )
+        self.output_text.grid(row=1, column=0, sticky="nsew")
+
+        scrollbar = ttk.Scrollbar(
+            self.output_frame,
+            orient="vertical",
+            command=self.output_text.yview
+        )
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        self.output_text.configure(yscrollcommand=scrollbar.set)
+
+        buttons_out_frame = ttk.Frame(self.output_frame, style="App.TFrame")
+        buttons_out_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+
+        buttons_out_frame.columnconfigure(0, weight=1)
+        buttons_out_frame.columnconfigure(1, weight=0)
+
+        self.clear_result_button = ttk.Button(
+            buttons_out_frame,
+            text="Clear result",
+            command=self.on_clear_result,
+            style="App.TButton"
+        )
+        self.clear_result_button.grid(row=0, column=0, sticky="w")
+
+        actions_frame = ttk.Frame(buttons_out_frame, style="App.TFrame")
+        actions_frame.grid(row=0, column=1, sticky="e")
+
+        self.copy_button = ttk.Button(
+            actions_frame,
+            text="Copy to clipboard",
+            command=self.on_copy,
+            style="App.TButton"
+        )
+        self.copy_button.grid(row=0, column=0, padx=(0, 5))
+
+        self.copy_json_button = ttk.Button(
+            actions_frame,
+            text="Copy JSON",
+            command=self.on_copy_json,
+            style="App.TButton"
+        )
+        self.copy_json_button.grid(row=0, column=1, padx=(0, 5))
+
+        self.save_button = ttk.Button(
+            actions_frame,
+            text="Save statblock",
+            command=self.on_save,
+            style="App.TButton"
+        )
+        self.save_button.grid(row=0, column=2)
+
+        self.status_var = tk.StringVar(value="")
+        self.status_bar = ttk.Label(
+            self,
+            textvariable=self.status_var,
+            relief="sunken",
+            anchor="w",
+            padding=5
+        )
+        self.status_bar.grid(row=4, column=0, sticky="ew", padx=10, pady=(4, 6))
+
+        self.setup_base_styles()
+        self.apply_theme("dark")
+
+        self.race_combo.focus_set()
+        self.bind("<Return>", lambda event: self.on_generate())
+        self.bind("<Escape>", lambda event: self.on_stop())
+
+        self.last_raw_data = None
+        self.library_window = None
+        self.results_windows = []
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=GENERATION_WORKERS,
+            thread_name_prefix="npc-generation"
+        )
+        self.result_queue = queue.Queue()
+        self._pending_jobs = set()
+        self._job_traces = {}
+        self._job_tokens = {}
+        # job id -> roster text, for jobs that generate a whole encounter.
+        self._encounter_jobs = {}
+        self._next_job_id = 0
+        self._poll_after_id = self.after(RESULT_POLL_MS, self.poll_results)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        if not has_api_key():
+            self.set_status(
+                "OPENAI_API_KEY is missing – offline mode, mechanics only."
+            )
+        else:
+            warm_up_client()
+
+        self.npc_pool = NpcPool(generate_npc)
+        if self.prefetch_var.get():
+            self.on_prefetch_changed()
+
+        self.center_window()
+
+    def center_window(self):
+        self.update_idletasks()
+        w = self.winfo_width()
+        h = self.winfo_height()
+        x = (self.winfo_screenwidth() // 2) - (w // 2)
+        y = (self.winfo_screenheight() // 2) - (h // 2)
+        self.geometry(f"{w}x{h}+{x}+{y}")
+
+    def set_status(self, text: str):
+        self.status_var.set(text)
+        self.update_idletasks()
+
+    def set_output(self, text: str):
+        self.output_text.config(state="normal")
+        self.output_text.delete("1.0", tk.END)
+        self.output_text.insert(tk.END, text)
+        self.output_text.config(state="disabled")
+
+    def output_shows_thinking(self):
+        content = self.output_text.get("1.0", "end-1c").strip()
+        return (
+            content.startswith(THINKING_MESSAGE)
+            or content.endswith(THINKING_MESSAGE)
+        )
+
+    def setup_base_styles(self):
+        self.style.configure("App.TFrame")
+        self.style.configure("AppTitle.TFrame")
+        self.style.configure("App.TLabel")
+        self.style.configure("AppTitle.TLabel")
+        self.style.configure("AppInner.TLabel")
+        self.style.configure("App.TCheckbutton")
+        self.style.configure("App.TButton", padding=6)
+        self.style.configure("App.TCombobox")
+        self.style.configure("App.TSpinbox")
+        self.style.configure("Vertical.TScrollbar")
+
+    def apply_theme(self, theme: str):
+        if theme == "light":
+            self.configure(bg="#F0F0F0")
+
+            self.style.configure("AppTitle.TFrame", background="#F0F0F0")
+            self.style.configure(
+                "AppTitle.TLabel",
+                background="#F0F0F0",
+                foreground="#000000"
+            )
+
+            self.style.configure("App.TFrame", background="#FFFFFF")
+            self.style.configure(
+                "App.TLabel",
+                background="#FFFFFF",
+                foreground="#000000"
+            )
+            self.style.configure(
+                "AppInner.TLabel",
+                background="#FFFFFF",
+                foreground="#000000"
+            )
+
+            self.style.configure(
+                "App.TCheckbutton",
+                background="#FFFFFF",
+                foreground="#000000"
+            )
+            self.style.map(
+                "App.TCheckbutton",
+                background=[("active", "#FFFFFF"), ("selected", "#FFFFFF")],
+                foreground=[("active", "#000000"), ("selected", "#000000")]
+            )
+
+            self.style.configure(
+                "App.TButton",
+                background="#E0E0E0",
+                foreground="#000000"
+            )
+            self.style.map(
+                "App.TButton",
+                background=[("active", "#D0D0D0")]
+            )
+
+            self.style.configure(
+                "App.TCombobox",
+                fieldbackground="#FFFFFF",
+                foreground="#000000",
+                background="#FFFFFF"
+            )
+            self.style.map(
+                "App.TCombobox",
+                fieldbackground=[("readonly", "#FFFFFF")],
+                foreground=[("readonly", "#000000")],
+                arrowcolor=[("!disabled", "#000000")]
+            )
+
+            self.style.configure(
+                "App.TSpinbox",
+                fieldbackground="#FFFFFF",
+                foreground="#000000",
+                background="#FFFFFF"
+            )
+            self.style.map(
+                "App.TSpinbox",
+                arrowcolor=[("!disabled", "#000000")]
+            )
+
+            self.style.configure("TSeparator", background="#D0D0D0")
+            self.style.configure(
+                "Vertical.TScrollbar",
+                troughcolor="#F0F0F0",
+                background="#C0C0C0",
+                arrowcolor="#000000"
+            )
+            self.style.configure(
+                "Treeview",
+                background="#FFFFFF",
+                fieldbackground="#FFFFFF",
+                foreground="#000000"
+            )
+            self.style.configure(
+                "Treeview.Heading",
+                background="#E0E0E0",
+                foreground="#000000"
+            )
+            self.style.map(
+                "Treeview",
+                background=[("selected", "#C8DDF5")],
+                foreground=[("selected", "#000000")]
+            )
+
+            self.description_text.configure(
+                bg="#FAFAFA",
+                fg="#000000",
+                insertbackground="#000000",
+                relief="solid",
+                bd=1,
+                highlightthickness=0
+            )
+            self.output_text.configure(
+                bg="#FFFFFF",
+                fg="#000000",
+                insertbackground="#000000",
+                relief="solid",
+                bd=1,
+                highlightthickness=0
+            )
+
+            self.status_bar.configure(
+                background="#E0E0E0",
+                foreground="#000000"
+            )
+
+            self.option_add("*Menu.background", "#F0F0F0")
+            self.option_add("*Menu.foreground", "#000000")
+            self.option_add("*Menu.activeBackground", "#D0D0D0")
+            self.option_add("*Menu.activeForeground", "#000000")
+
+        else:
+            self.configure(bg="#121212")
+
+            self.style.configure("AppTitle.TFrame", background="#121212")
+            self.style.configure(
+                "AppTitle.TLabel",
+                background="#121212",
+                foreground="#F5F5F5"
+            )
+
+            self.style.configure("App.TFrame", background="#1E1E1E")
+            self.style.configure(
+                "App.TLabel",
+                background="#1E1E1E",
+                foreground="#F5F5F5"
+            )
+            self.style.configure(
+                "AppInner.TLabel",
+                background="#1E1E1E",
+                foreground="#F5F5F5"
+            )
+
+            self.style.configure(
+                "App.TCheckbutton",
+                background="#1E1E1E",
+                foreground="#F5F5F5"
+            )
+            self.style.map(
+                "App.TCheckbutton",
+                background=[("active", "#2A2A2A"), ("selected", "#2A2A2A")],
+                foreground=[("active", "#F5F5F5"), ("selected", "#F5F5F5")]
+            )
+
+            self.style.configure(
+                "App.TButton",
+                background="#2D2D2D",
+                foreground="#F5F5F5"
+            )
+            self.style.map(
+                "App.TButton",
+                background=[("active", "#3A3A3A")]
+            )
+
+            self.style.configure(
+                "App.TCombobox",
+                fieldbackground="#2A2A2A",
+                foreground="#F5F5F5",
+                background="#2A2A2A"
+            )
+            self.style.map(
+                "App.TCombobox",
+                fieldbackground=[("readonly", "#2A2A2A")],
+                foreground=[("readonly", "#F5F5F5")],
+                arrowcolor=[("!disabled", "#F5F5F5")]
+            )
+
+            self.style.configure(
+                "App.TSpinbox",
+                fieldbackground="#2A2A2A",
+                foreground="#F5F5F5",
+                background="#2A2A2A"
+            )
+            self.style.map(
+                "App.TSpinbox",
+                arrowcolor=[("!disabled", "#F5F5F5")]
+            )
+
+            self.style.configure("TSeparator", background="#333333")
+            self.style.configure(
+                "Vertical.TScrollbar",
+                troughcolor="#1E1E1E",
+                background="#3A3A3A",
+                arrowcolor="#F5F5F5"
+            )
+            self.style.configure(
+                "Treeview",
+                background="#1E1E1E",
+                fieldbackground="#1E1E1E",
+                foreground="#F5F5F5"
+            )
+            self.style.configure(
+                "Treeview.Heading",
+                background="#2A2A2A",
+                foreground="#F5F5F5"
+            )
+            self.style.map(
+                "Treeview",
+                background=[("selected", "#3A3A3A")],
+                foreground=[("selected", "#F5F5F5")]
+            )
+
+            self.description_text.configure(
+                bg="#2A2A2A",
+                fg="#F5F5F5",
+                insertbackground="#F5F5F5",
+                relief="solid",
+                bd=1,
+                highlightthickness=0
+            )
+            self.output_text.configure(
+                bg="#1E1E1E",
+                fg="#F5F5F5",
+                insertbackground="#F5F5F5",
+                relief="solid",
+                bd=1,
+                highlightthickness=1,
+                highlightbackground="#F5F5F5",
+                highlightcolor="#F5F5F5"
+            )
+
+            self.status_bar.configure(
+                background="#1A1A1A",
+                foreground="#F5F5F5"
+            )
+
+            self.option_add("*Menu.background", "#1E1E1E")
+            self.option_add("*Menu.foreground", "#F5F5F5")
+            self.option_add("*Menu.activeBackground", "#3A3A3A")
+            self.option_add("*Menu.activeForeground", "#F5F5F5")
+
+    def on_theme_changed(self, event=None):
+        self.apply_theme(self.theme_var.get())
+        if self.library_window is not None and self.library_window.winfo_exists():
+            self.library_window.apply_theme(self.theme_var.get() == "dark")
+        self.results_windows = [w for w in self.results_windows if w.winfo_exists()]
+        for window in self.results_windows:
+            window.apply_theme(self.theme_var.get() == "dark")
+
+    def on_about(self):
+        messagebox.showinfo(
+            "About",
+            "DnD NPC Generator\n\n"
+            "Simple Tkinter-based tool that uses OpenAI to generate "
+            "Dungeons & Dragons NPC statblocks.",
+            parent=self
+        )
+
+    def on_class_changed(self, event=None):
+        selected_class = self.class_var.get()
+        subclasses = CLASS_TO_SUBCLASSES.get(selected_class, [])
+        self.subclass_combo["values"] = subclasses
+        self.subclass_var.set("")
+
+    def on_random(self):
+        entry = None
+        if self.prefetch_var.get():
+            entry = self.npc_pool.take()
+
+        spec = entry[0] if entry is not None else random_npc_spec()
+        self.race_var.set(spec["race"])
+        self.class_var.set(spec["char_class"])
+        self.subclass_combo["values"] = CLASS_TO_SUBCLASSES.get(spec["char_class"], [])
+        self.subclass_var.set(spec["subclass"])
+        self.level_var.set(str(spec["level"]))
+
+        if entry is None:
+            if self.prefetch_var.get() and has_api_key():
+                self.set_status("Random NPC parameters set (prefetch pool is refilling).")
+            else:
+                self.set_status("Random NPC parameters set.")
+            return
+
+        spec, data, formatted = entry
+        self.include_spells_var.set(True)
+        self.description_text.delete("1.0", tk.END)
+        self.last_raw_data = data
+        self.set_output(formatted)
+        stats = self.npc_pool.stats()
+        self.set_status(
+            f"Random NPC ready ({stats['ready']}/{stats['size']} more prefetched, "
+            f"{stats['tokens_last_hour']}/{stats['token_budget']} tokens this hour)."
+        )
+
+    def on_prefetch_changed(self):
+        if not has_api_key():
+            self.set_status("Prefetching needs OPENAI_API_KEY.")
+            return
+        if self.prefetch_var.get():
+            self.npc_pool.start()
+            self.set_status("Prefetching random NPCs in the background.")
+        else:
+            self.npc_pool.stop()
+            self.set_status("Prefetching stopped.")
+
+    def on_generate(self):
+        race = self.race_var.get().strip()
+        char_class = self.class_var.get().strip()
+        subclass = self.subclass_var.get().strip()
+        level_str = self.level_var.get().strip()
+        include_spells = self.include_spells_var.get()
+        fresh = self.fresh_variant_var.get()
+        role_description = self.description_text.get("1.0", "end-1c").strip()
+
+        if not race or not char_class or not level_str:
+            messagebox.showerror("Error", "Please fill Race, Class and Level.", parent=self)
+            self.set_status("Missing required fields.")
+            return
+
+        try:
+            level = int(level_str)
+        except ValueError:
+            messagebox.showerror("Error", "Level must be an integer.", parent=self)
+            self.set_status("Invalid level value.")
+            return
+
+        if level < 1 or level > 20:
+            messagebox.showerror("Error", "Level must be between 1 and 20.", parent=self)
+            self.set_status("Level must be between 1 and 20.")
+            return
+
+        if not has_api_key():
+            data, formatted = generate_offline_npc(race, char_class, subclass, level)
+            self.last_raw_data = data
+            self.set_output(formatted)
+            self.set_status("Offline NPC generated (no OPENAI_API_KEY).")
+            return
+
+        self._next_job_id += 1
+        job_id = self._next_job_id
+        self._pending_jobs.add(job_id)
+        self.set_status(self.pending_status_text())
+
+        self.set_output(THINKING_MESSAGE + "\n")
+
+        on_update = None
+        if self.stream_output_var.get():
+            def on_update(partial, job_id=job_id):
+                self.result_queue.put(("partial", job_id, partial))
+
+        trace = GenerationTrace(mode="gui", stream=on_update is not None)
+        self._job_traces[job_id] = trace
+        token = CancelToken(GENERATION_TIMEOUT or None)
+        self._job_tokens[job_id] = token
+        self.update_stop_button()
+
+        future = self.executor.submit(
+            generate_npc,
+            race,
+            char_class,
+            subclass,
+            level,
+            include_spells,
+            role_description,
+            fresh,
+            on_update,
+            trace=trace,
+            cancel=token
+        )
+        future.add_done_callback(
+            lambda f, job_id=job_id: self.result_queue.put(("done", job_id, f))
+        )
+
+    def on_generate_encounter(self):
+        roster = simpledialog.askstring(
+            "Generate encounter",
+            "Roster, e.g. \"4 bandits level 3, 1 Human Fighter captain level 7\":",
+            parent=self
+        )
+        if not roster or not roster.strip():
+            return
+        try:
+            groups = parse_roster(roster)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid roster: {e}", parent=self)
+            self.set_status("Invalid roster.")
+            return
+        roster = roster.strip()
+        include_spells = self.include_spells_var.get()
+
+        if not has_api_key():
+            self.show_encounter(roster, offline_encounter(groups))
+            self.set_status("Offline encounter generated (no OPENAI_API_KEY).")
+            return
+
+        self._next_job_id += 1
+        job_id = self._next_job_id
+        self._pending_jobs.add(job_id)
+        self._encounter_jobs[job_id] = roster
+        members = sum(group["count"] for group in groups)
+        self.set_status(f"Generating encounter of {members} NPCs...")
+
+        trace = GenerationTrace(mode="encounter")
+        self._job_traces[job_id] = trace
+        token = CancelToken(GENERATION_TIMEOUT or None)
+        self._job_tokens[job_id] = token
+        self.update_stop_button()
+
+        future = self.executor.submit(
+            generate_encounter,
+            groups,
+            include_spells,
+            trace=trace,
+            cancel=token
+        )
+        future.add_done_callback(
+            lambda f, job_id=job_id: self.result_queue.put(("done", job_id, f))
+        )
+
+    def show_encounter(self, roster, members):
+        window = ResultsWindow(
+            self,
+            f"Encounter - {roster}",
+            on_open=lambda data, statblock: self.show_npc(data, statblock, "the encounter"),
+            dark=self.theme_var.get() == "dark"
+        )
+        for data, formatted in members:
+            window.append(data, formatted)
+        self.results_windows.append(window)
+
+    def on_stop(self):
+        if not self._pending_jobs:
+            return
+        # Workers see the cancel at their next network read or backoff and
+        # finish on their own; their results are ignored from now on.
+        for job_id in self._pending_jobs:
+            self._job_tokens[job_id].cancel("stopped by user")
+        count = len(self._pending_jobs)
+        self._pending_jobs.clear()
+        self.update_stop_button()
+
+        if self.output_shows_thinking():
+            self.last_raw_data = None
+            self.set_output("")
+        self.set_status("Generation stopped." if count == 1 else f"{count} generations stopped.")
+
+    def update_stop_button(self):
+        self.stop_button.config(state="normal" if self._pending_jobs else "disabled")
+
+    def pending_status_text(self):
+        count = len(self._pending_jobs)
+        if count == 1:
+            return "Generating NPC..."
+        return f"Generating {count} NPCs..."
+
+    def poll_results(self):
+        # Rescheduled whatever happens, so one bad result cannot stop
+        # every later one from being delivered.
+        try:
+            self.deliver_results()
+        finally:
+            self._poll_after_id = self.after(RESULT_POLL_MS, self.poll_results)
+
+    def deliver_results(self):
+        latest_partial = None
+        try:
+            while True:
+                kind, job_id, payload = self.result_queue.get_nowait()
+                if kind == "partial":
+                    if job_id == self._next_job_id and job_id in self._pending_jobs:
+                        latest_partial = payload
+                else:
+                    if job_id == self._next_job_id:
+                        latest_partial = None
+                    self.on_generation_done(job_id, payload)
+        except queue.Empty:
+            pass
+
+        if latest_partial is not None:
+            # Streamed partials are not validated yet; skip one that
+            # cannot be shown and wait for the next.
+            try:
+                preview = format_statblock(latest_partial)
+            except (TypeError, ValueError, AttributeError):
+                return
+            self.set_output(preview + "\n" + THINKING_MESSAGE)
+
+    def on_generation_done(self, job_id, future):
+        stopped = job_id not in self._pending_jobs
+        self._pending_jobs.discard(job_id)
+        self.update_stop_button()
+        trace = self._job_traces.pop(job_id)
+        token = self._job_tokens.pop(job_id)
+        token.close()
+        roster = self._encounter_jobs.pop(job_id, None)
+
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if isinstance(error, Cancelled) or token.cancelled:
+            log_trace(trace, error=f"Cancelled: {token.reason}")
+            if stopped:
+                return
+            # Hard timeout (GENERATION_TIMEOUT), not a Stop click.
+            if not self._pending_jobs and self.output_shows_thinking():
+                self.last_raw_data = None
+                self.set_output("")
+            self.set_status(f"Stopped: {token.reason}.")
+            return
+
+        if error is not None:
+            log_trace(trace, error=f"{type(error).__name__}: {error}")
+            if not self._pending_jobs and self.output_shows_thinking():
+                self.last_raw_data = None
+                self.set_output("")
+            messagebox.showerror(
+                "Error",
+                f"An error occurred during AI call or formatting:\n{error}",
+                parent=self
+            )
+            self.set_status("Error during NPC generation.")
+            return
+
+        if roster is not None:
+            members = future.result()
+            log_trace(trace)
+            self.show_encounter(roster, members)
+            self.set_status(f"Encounter of {len(members)} NPCs generated in {trace.summary()}.")
+            return
+
+        data, formatted = future.result()
+        if job_id != self._next_job_id:
+            # A newer NPC owns the output pane (and Export/Copy); this one
+            # is already in the library.
+            log_trace(trace)
+            name = data.get("name", "NPC") if isinstance(data, dict) else "NPC"
+            status = f"Earlier NPC {name} generated in {trace.summary()} and saved to the library."
+            if self._pending_jobs:
+                status += f" {self.pending_status_text()}"
+            self.set_status(status)
+            return
+
+        if isinstance(data, dict):
+            self.last_raw_data = data
+        else:
+            self.last_raw_data = None
+
+        with trace.stage("render"):
+            self.set_output(formatted)
+            self.update_idletasks()
+        log_trace(trace)
+
+        if self._pending_jobs:
+            self.set_status(
+                f"NPC generated in {trace.summary()}. {self.pending_status_text()}"
+            )
+        else:
+            self.set_status(
+                f"NPC generated in {trace.summary()}. "
+                f"({self.cache_status_text()}, {self.connection_status_text()})"
+            )
+
+    def cache_status_text(self):
+        stats = get_statblock_cache().stats()
+        return f"Cache: {stats['hits']} hits / {stats['misses']} misses"
+
+    def connection_status_text(self):
+        stats = connection_stats.snapshot()
+        text = f"Connections reused: {stats['reused']}/{stats['requests']} requests"
+        retries = request_stats.snapshot()
+        if retries["retries"] or retries["hedges"]:
+            text += (
+                f", retries: {retries['retries']}, "
+                f"hedges won: {retries['hedge_wins']}/{retries['hedges']}"
+            )
+        coalesced = single_flight.snapshot()["coalesced"]
+        if coalesced:
+            text += f", coalesced: {coalesced}"
+        return text
+
+    def on_open_library(self):
+        if self.library_window is not None and self.library_window.winfo_exists():
+            self.library_window.lift()
+            self.library_window.focus_search()
+            return
+        self.library_window = LibraryWindow(
+            self,
+            get_npc_library(),
+            on_open=self.show_library_npc,
+            dark=self.theme_var.get() == "dark"
+        )
+
+    def show_library_npc(self, npc_id):
+        entry = get_npc_library().get(npc_id)
+        if entry is None:
+            self.set_status("NPC not found in the library.")
+            return
+        data, statblock = entry
+        self.show_npc(data, statblock, "the library")
+
+    def show_npc(self, data, statblock, source):
+        self.last_raw_data = data
+        self.set_output(statblock)
+        self.set_status(f"Loaded {data.get('name', 'NPC')} from {source}.")
+
+    def on_open_batch_results(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Batch results", "*.jsonl"), ("All files", "*.*")],
+            title="Open batch results",
+            parent=self
+        )
+        if not file_path:
+            return
+
+        window = ResultsWindow(
+            self,
+            f"Batch results - {os.path.basename(file_path)}",
+            on_open=lambda data, statblock: self.show_npc(
+                data, statblock, os.path.basename(file_path)
+            ),
+            dark=self.theme_var.get() == "dark"
+        )
+        window.follow(file_path)
+        self.results_windows.append(window)
+
+    def on_close(self):
+        self.npc_pool.stop()
+        for token in self._job_tokens.values():
+            token.cancel("application closed")
+        self.after_cancel(self._poll_after_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
+    def on_save(self):
+        content = self.output_text.get("1.0", "end-1c").strip()
+
+        if not content or self.output_shows_thinking():
+            self.set_status("Nothing to save.")
+            return
+
+        self.set_status("Saving statblock...")
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[
+                ("Text files", "*.txt"),
+                ("Markdown", "*.md"),
+                ("HTML", "*.html"),
+                ("All files", "*.*")
+            ],
+            title="Save statblock",
+            parent=self
+        )
+
+        if not file_path:
+            self.set_status("Save cancelled.")
+            return
+
+        render_format = SAVE_RENDER_FORMATS.get(os.path.splitext(file_path)[1].lower())
+
+        try:
+            with open(file_path, "w", encoding="utf-8") as f:
+                if render_format and isinstance(self.last_raw_data, dict):
+                    render_many([self.last_raw_data], f, render_format)
+                else:
+                    f.write(content)
+        except Exception as e:
+            self.set_status(f"Error while saving: {e}")
+            return
+
+        self.set_status(f"Saved: {file_path}")
+
+    def on_copy(self):
+        content = self.output_text.get("1.0", "end-1c").strip()
+
+        if not content or self.output_shows_thinking():
+            self.set_status("Nothing to copy.")
+            return
+
+        try:
+            self.clipboard_clear()
+            self.clipboard_append(content)
+            self.set_status("Statblock copied to clipboard.")
+        except Exception as e:
+            self.set_status(f"Error while copying: {e}")
+
+    def on_copy_json(self):
+        if not isinstance(self.last_raw_data, dict):
+            self.set_status("No JSON data to copy.")
+            return
+
+        try:
+            json_text = json.dumps(self.last_raw_data, indent=2)
+            self.clipboard_clear()
+            self.clipboard_append(json_text)
+            self.set_status("JSON copied to clipboard.")
+        except Exception as e:
+            self.set_status(f"Error while copying JSON: {e}")
+
+    def on_clear_result(self):
+        self.output_text.config(state="normal")
+        self.output_text.delete("1.0", tk.END)
+        self.output_text.config(state="disabled")
+        self.set_status("Result cleared.")
+
+    def on_clear_selection(self):
+        self.race_var.set("")
+        self.class_var.set("")
+        self.subclass_var.set("")
+        self.subclass_combo["values"] = []
+        self.level_var.set("1")
+        self.include_spells_var.set(True)
+        self.fresh_variant_var.set(False)
+        self.description_text.delete("1.0", tk.END)
+        self.set_status("Selection cleared.")
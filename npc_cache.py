@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+
+def app_data_dir():
+    path = os.getenv("NPC_GENERATOR_HOME") or os.path.join(
+        os.path.expanduser("~"), ".dnd_npc_generator"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def normalize_text(value):
+    return " ".join(str(value or "").split()).casefold()
+
+
+def hash_text(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def statblock_cache_key(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells,
+    role_description,
+    model,
+    temperature,
+    template_hash
+):
+    return hash_text(
+        normalize_text(race),
+        normalize_text(char_class),
+        normalize_text(subclass),
+        int(level),
+        bool(include_spells),
+        normalize_text(role_description),
+        model,
+        temperature,
+        template_hash,
+    )
+
+
+class StatblockCache:
+    def __init__(
+        self,
+        path=None,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        max_age_seconds=DEFAULT_MAX_AGE_SECONDS
+    ):
+        self.path = path or os.path.join(app_data_dir(), "cache.sqlite3")
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS statblocks ("
+                " key TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS statblocks_last_used "
+                "ON statblocks (last_used)"
+            )
+        self.evict()
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT data, created_at FROM statblocks WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.max_age_seconds:
+                    self.misses += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE statblocks SET last_used = ? WHERE key = ?",
+                    (now, key)
+                )
+                self.hits += 1
+                return json.loads(row[0])
+        except (sqlite3.Error, ValueError):
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO statblocks "
+                    "(key, data, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(data), now, now)
+                )
+        except sqlite3.Error:
+            return
+        self.evict()
+
+    def note_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def evict(self):
+        cutoff = time.time() - self.max_age_seconds
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "DELETE FROM statblocks WHERE created_at < ?",
+                    (cutoff,)
+                )
+                self._conn.execute(
+                    "DELETE FROM statblocks WHERE key NOT IN ("
+                    " SELECT key FROM statblocks"
+                    " ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        with self._lock:
+            try:
+                entries = self._conn.execute(
+                    "SELECT COUNT(*) FROM statblocks"
+                ).fetchone()[0]
+            except sqlite3.Error:
+                entries = 0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "entries": entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SpellSummaryStore:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), "cache.sqlite3")
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS spell_summaries ("
+                " name_key TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " summary TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def get_many(self, spell_names):
+        keys = list(dict.fromkeys(normalize_text(n) for n in spell_names))
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT name_key, summary FROM spell_summaries "
+                    f"WHERE name_key IN ({placeholders})",
+                    keys
+                ).fetchall()
+        except sqlite3.Error:
+            rows = []
+        found = dict(rows)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, summaries):
+        now = time.time()
+        rows = [
+            (normalize_text(name), str(name), str(summary), now)
+            for name, summary in summaries.items()
+            if str(summary).strip()
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO spell_summaries "
+                    "(name_key, name, summary, updated_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        with self._lock:
+            try:
+                entries = self._conn.execute(
+                    "SELECT COUNT(*) FROM spell_summaries"
+                ).fetchone()[0]
+            except sqlite3.Error:
+                entries = 0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,128 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_current_token = contextvars.ContextVar("npc_cancel_token", default=None)
+
+
+class Cancelled(Exception):
+    pass
+
+
+class GenerationTimeout(Cancelled):
+    # Deliberately not a TimeoutError: is_retryable() must not retry it.
+    pass
+
+
+class CancelToken:
+    """Stop switch for one generation, shared by every call it makes.
+
+    cancel() (from any thread) wakes everything waiting on the token and
+    runs the registered callbacks, which close open streams. With timeout,
+    the token cancels itself that many seconds after creation; close()
+    stops the timer once the generation is over.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self._error_type = Cancelled
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._timer = None
+        if timeout:
+            self._timer = threading.Timer(
+                timeout,
+                self.cancel,
+                args=(f"generation timed out after {timeout:g}s", GenerationTimeout)
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def timed_out(self):
+        return self._event.is_set() and self._error_type is GenerationTimeout
+
+    def cancel(self, reason="generation stopped", error_type=Cancelled):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._error_type = error_type
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        if self._event.is_set():
+            raise self._error_type(self.reason)
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def sleep(self, seconds):
+        if self._event.wait(seconds):
+            self.check()
+
+    @contextmanager
+    def on_cancel(self, callback):
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+    @contextmanager
+    def activate(self):
+        token = _current_token.set(self)
+        try:
+            yield self
+        finally:
+            _current_token.reset(token)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def current_token():
+    return _current_token.get()
+
+
+def activate_cancel(token):
+    if token is None:
+        return nullcontext()
+    return token.activate()
+
+
+def check_cancelled():
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+def on_cancel(callback):
+    token = _current_token.get()
+    if token is None:
+        return nullcontext()
+    return token.on_cancel(callback)
@@ -0,0 +1,1485 @@
+import contextvars
+import json
+import os
+import random
+import threading
+
+from json_stream import IncrementalObjectParser, apply_events, salvage_object
+from npc_library import NpcLibrary
+from npc_cancel import activate_cancel, check_cancelled, on_cancel
+from npc_model import Npc
+from npc_metrics import (
+    activate_trace,
+    annotate,
+    current_trace,
+    note_call,
+    stage,
+    usage_tokens,
+)
+from npc_schema import (
+    FLAVOR_FIELDS,
+    STATBLOCK_FIELDS,
+    example_value,
+    fields_with_summaries,
+    problem_fields,
+    response_format,
+    schema_text,
+    validate_and_repair,
+)
+from npc_cache import (
+    SpellSummaryStore,
+    StatblockCache,
+    hash_text,
+    normalize_text,
+    statblock_cache_key,
+)
+from npc_singleflight import SingleFlight
+from npc_retry import (
+    AttemptTimeout,
+    RequestStats,
+    RetryPolicy,
+    acall_with_retries,
+    call_with_retries,
+    is_retryable,
+)
+from rules import (
+    compute_mechanics,
+    format_modifier,
+    mechanics_summary,
+    offline_statblock,
+)
+
+MODEL_NAME = "gpt-4.1-mini"
+
+RACES = [
+    "Human",
+    "Elf",
+    "Dwarf",
+    "Halfling",
+    "Gnome",
+    "Half-Elf",
+    "Half-Orc",
+    "Tiefling",
+    "Dragonborn"
+]
+
+CLASS_TO_SUBCLASSES = {
+    "Barbarian": ["Path of the Berserker", "Path of the Totem Warrior"],
+    "Bard": ["College of Lore", "College of Valor"],
+    "Cleric": ["Life Domain", "Light Domain", "Trickery Domain"],
+    "Druid": ["Circle of the Land", "Circle of the Moon"],
+    "Fighter": ["Champion", "Battle Master", "Eldritch Knight"],
+    "Monk": ["Way of the Open Hand", "Way of Shadow"],
+    "Paladin": ["Oath of Devotion", "Oath of Vengeance"],
+    "Ranger": ["Hunter", "Beast Master"],
+    "Rogue": ["Thief", "Assassin", "Arcane Trickster"],
+    "Sorcerer": ["Draconic Bloodline", "Wild Magic"],
+    "Warlock": ["Fiend", "Archfey", "Great Old One", "Hexblade"],
+    "Wizard": ["Evocation", "Illusion", "Necromancy", "Abjuration"],
+}
+
+CLASSES = list(CLASS_TO_SUBCLASSES.keys())
+
+
+def random_npc_spec():
+    char_class = random.choice(CLASSES)
+    subclasses = CLASS_TO_SUBCLASSES.get(char_class, [])
+    return {
+        "race": random.choice(RACES),
+        "char_class": char_class,
+        "subclass": random.choice(subclasses) if subclasses else "",
+        "level": random.randint(1, 20),
+    }
+
+
+def known_name(value, names):
+    """The entry of names that value spells ignoring case, or ""."""
+    key = str(value or "").strip().casefold()
+    for name in names:
+        if name.casefold() == key:
+            return name
+    return ""
+
+
+def canonical_spec(race, char_class, subclass):
+    """Race, class and subclass as spelled in RACES and CLASS_TO_SUBCLASSES.
+
+    Batch rows and the command line accept "elf" or "wizard"; the rules
+    engine's tables only know "Elf" and "Wizard". Unknown names are kept.
+    """
+    race = known_name(race, RACES) or race
+    char_class = known_name(char_class, CLASSES) or char_class
+    subclass = known_name(subclass, CLASS_TO_SUBCLASSES.get(char_class, [])) or subclass
+    return race, char_class, subclass
+
+
+def rules_apply(race, char_class):
+    # For any other race or class the rules engine would fall back to
+    # generic numbers, so the model writes the mechanics instead.
+    return race in RACES and char_class in CLASSES
+
+JSON_SCHEMA = schema_text(STATBLOCK_FIELDS)
+
+# Used when the rules engine supplies the mechanical fields.
+FLAVOR_SCHEMA = schema_text(FLAVOR_FIELDS)
+
+JSON_SCHEMA_WITH_SUMMARIES = schema_text(fields_with_summaries(STATBLOCK_FIELDS))
+
+STATBLOCK_SYSTEM_PROMPT = (
+    "You are a helpful Dungeons and Dragons 2024 Dungeon Master assistant. "
+    "You always respond with valid JSON only, without markdown fences."
+)
+
+# The statblock prompt is a static part (one per schema, byte-identical for
+# every NPC) followed by the per-NPC part, so providers that cache prompt
+# prefixes can reuse the static part across requests. Keep anything that
+# varies per NPC out of the static templates.
+STATBLOCK_PROMPT_TEMPLATE = """
+You are a Dungeons & Dragons 5e / 2024 NPC generator.
+
+Create a single NPC stat block for the NPC described at the end of this
+message.
+
+Requirements:
+- Fill out all fields in the following JSON structure.
+- Make the numbers and choices consistent with the concept (no nonsense values).
+- Keep lists (skills, attacks, spells, features) reasonably short but useful.
+- Follow the spell instructions given with the NPC.
+
+VERY IMPORTANT:
+- Return ONLY valid JSON.
+- Do NOT wrap it in markdown.
+- Do NOT include ``` or ```json fences.
+- The response must start with '{{' and end with '}}'.
+
+JSON structure:
+
+{json_schema}
+"""
+
+# Same requirements in a few lines. The JSON example is left out when the
+# API enforces the schema anyway (see compact_json_requirement()).
+COMPACT_STATBLOCK_PROMPT_TEMPLATE = """Create one D&D 5e (2024) NPC stat block for the NPC below.
+Values consistent with the concept; lists short but useful; follow the spell instructions.
+{json_requirement}"""
+
+STATBLOCK_NPC_TEMPLATE = """
+NPC:
+- Race: {race}
+- Class: {char_class}
+- Subclass: {subclass_text}
+- Level: {level}
+{role_text}{mechanics_text}{spells_requirement}"""
+
+STATBLOCK_TEMPERATURE = 0.7
+
+COMBINED_SPELLS_REQUIREMENT = (
+    "Include appropriate spell lists for the NPC. For every spell also give "
+    "ONE very short mechanical summary: attack roll or saving throw (which "
+    "ability), damage dice and type, and any important extra effect.\n"
+)
+
+MECHANICS_TEXT_TEMPLATE = (
+    "These mechanics are already fixed by the rules engine. Use them (for "
+    "example for attack and save bonuses) but do NOT repeat them in the "
+    "JSON: {summary}.\n"
+)
+
+# Sent after a truncated or incomplete statblock; only the listed fields
+# are requested again.
+MISSING_FIELDS_PROMPT_TEMPLATE = """
+Your JSON was cut off or some fields were missing or invalid.
+Return ONLY a JSON object with these fields, consistent with the NPC above:
+
+{json_schema}
+"""
+
+# Compute HP, AC, abilities, saves and speed locally (rules.py) and only
+# ask the model for the flavor fields. Set NPC_RULES_ENGINE=0 to let the
+# model invent the whole statblock.
+RULES_ENGINE = os.getenv("NPC_RULES_ENGINE", "1") != "0"
+
+# Ask the API to enforce the statblock JSON schema (response_format
+# json_schema). Set NPC_STRUCTURED_OUTPUT=0 for endpoints without support.
+STRUCTURED_OUTPUT = os.getenv("NPC_STRUCTURED_OUTPUT", "1") != "0"
+
+# Fold spell summaries into the statblock request (one round trip instead
+# of two). Compare both modes with "python -m benchmarks.combined_mode".
+COMBINED_MODE = os.getenv("NPC_COMBINED_MODE", "") == "1"
+
+# Send COMPACT_STATBLOCK_PROMPT_TEMPLATE instead of the long prompt.
+# Compare both with "python -m benchmarks.token_budget".
+COMPACT_PROMPT = os.getenv("NPC_COMPACT_PROMPT", "") == "1"
+
+# Level-dependent max_tokens (see statblock_max_tokens()). A response cut
+# off at the cap is finished by the missing-fields request. Set
+# NPC_OUTPUT_CAPS=0 to leave the length to the model.
+OUTPUT_CAPS = os.getenv("NPC_OUTPUT_CAPS", "1") != "0"
+OUTPUT_CAP_BASE = 300
+OUTPUT_CAP_PER_LEVEL = 20
+OUTPUT_CAP_MECHANICS = 200
+OUTPUT_CAP_SPELLS_PER_LEVEL = 15
+OUTPUT_CAP_SUMMARIES_PER_LEVEL = 30
+SPELL_SUMMARY_CAP_BASE = 60
+SPELL_SUMMARY_CAP_PER_SPELL = 40
+
+SPELL_SUMMARY_SYSTEM_PROMPT = (
+    "You always return ONLY valid JSON in the requested format."
+)
+
+# Static instructions first and the spell list last, like the statblock
+# prompt, so the instructions form a cacheable prefix.
+SPELL_SUMMARY_PROMPT_TEMPLATE = """
+You are summarizing Dungeons & Dragons spells in short mechanical form.
+
+For each spell, write ONE very short rules-like line in English including:
+- whether it uses an attack roll or a saving throw
+- if a saving throw: which ability (Dex, Wis, etc.), vs. the caster's spell save DC
+- what damage dice it deals and what damage type (e.g. 2d6 fire)
+- any important extra effect (for example: frightened, prone, restrained, half damage on success, etc.)
+
+Do NOT explain full rules. Be compact and game-oriented.
+
+Return ONLY valid JSON in this exact format:
+{{
+  "spell_summaries": {{
+    "Spell Name": "short mechanical summary",
+    "Other Spell": "short mechanical summary"
+  }}
+}}
+
+Spells to summarize:
+{spells}
+"""
+
+SPELL_SUMMARY_TEMPERATURE = 0.3
+
+PIPELINE_WORKERS = 4
+
+# Shared by every model call. Keep-alive connections are held much longer
+# than the httpx default (5 s) so that a click a minute after the previous
+# one still reuses the warm TLS connection.
+HTTP_MAX_CONNECTIONS = 16
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 8
+HTTP_KEEPALIVE_EXPIRY = 120.0
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP_READ_TIMEOUT = 90.0
+HTTP_WRITE_TIMEOUT = 10.0
+HTTP_POOL_TIMEOUT = 10.0
+
+# Retries replace the SDK's own, so each attempt gets its own timeout and
+# all of them share one deadline (see npc_retry.py).
+REQUEST_ATTEMPT_TIMEOUT = 60.0
+REQUEST_DEADLINE = 150.0
+REQUEST_MAX_ATTEMPTS = 4
+
+# Send a duplicate request when one runs past the p95 latency seen so far
+# and use whichever answers first. Costs extra tokens on the slow tail, so
+# it is opt-in: NPC_HEDGE_REQUESTS=1.
+HEDGE_REQUESTS = os.getenv("NPC_HEDGE_REQUESTS", "") == "1"
+
+# Hard limit for one GUI generation, in seconds, after which it is
+# cancelled like a Stop click. NPC_GENERATION_TIMEOUT=0 disables it.
+try:
+    GENERATION_TIMEOUT = float(os.getenv("NPC_GENERATION_TIMEOUT", "120"))
+except ValueError:
+    GENERATION_TIMEOUT = 120.0
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_async_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.async_trace
+
+    def trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.started":
+            with self._lock:
+                self.new_connections += 1
+
+    async def async_trace(self, event_name, info):
+        self.trace(event_name, info)
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            }
+
+
+connection_stats = ConnectionStats()
+
+retry_policy = RetryPolicy(
+    max_attempts=REQUEST_MAX_ATTEMPTS,
+    attempt_timeout=REQUEST_ATTEMPT_TIMEOUT,
+    deadline=REQUEST_DEADLINE,
+    hedge=HEDGE_REQUESTS
+)
+request_stats = RequestStats()
+
+# Concurrent identical statblock and spell summary requests share one call.
+single_flight = SingleFlight()
+
+_pipeline_executor = None
+
+_usage_lock = threading.Lock()
+_usage_totals = {
+    "requests": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "total_tokens": 0,
+    "cached_tokens": 0,
+}
+
+_statblock_cache = None
+_spell_summary_store = None
+_cache_lock = threading.Lock()
+
+_npc_library = None
+
+
+def has_api_key():
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def http_settings():
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_WRITE_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+    }
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None and has_api_key():
+            from openai import DefaultHttpxClient, OpenAI
+
+            settings = http_settings()
+            _client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=settings["timeout"],
+                max_retries=0,
+                http_client=DefaultHttpxClient(
+                    event_hooks={"request": [connection_stats.on_request]},
+                    **settings
+                )
+            )
+        return _client
+
+
+def get_async_client():
+    global _async_client
+    with _client_lock:
+        if _async_client is None and has_api_key():
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            settings = http_settings()
+            _async_client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=settings["timeout"],
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(
+                    event_hooks={"request": [connection_stats.on_async_request]},
+                    **settings
+                )
+            )
+        return _async_client
+
+
+def warm_up_client():
+    # Import the SDK, build the client and open a pooled keep-alive
+    # connection in the background, so the first Generate click does not
+    # pay for DNS and TLS setup. Failures only mean the first request
+    # connects on its own.
+    def run():
+        client = get_client()
+        if client is None:
+            return
+        try:
+            client.models.retrieve(MODEL_NAME)
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=run, name="npc-client-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def create_completion(request, label):
+    # Always streamed: a stream can be closed from another thread, so a
+    # Stop click or the attempt's wall-clock limit drops the connection
+    # instead of waiting for the whole answer.
+    with stage(f"model:{label}"):
+        return call_with_retries(
+            lambda timeout: read_completion_stream(request, timeout, label),
+            retry_policy,
+            request_stats,
+            label
+        )
+
+
+async def acreate_completion(request, label):
+    with stage(f"model:{label}"):
+        response = await acall_with_retries(
+            lambda timeout: get_async_client().chat.completions.create(
+                **request, timeout=timeout
+            ),
+            retry_policy,
+            request_stats,
+            label
+        )
+    record_usage(response.usage, label)
+    return response.choices[0].message.content
+
+
+def get_pipeline_executor():
+    global _pipeline_executor
+    with _client_lock:
+        if _pipeline_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _pipeline_executor = ThreadPoolExecutor(
+                max_workers=PIPELINE_WORKERS,
+                thread_name_prefix="npc-pipeline"
+            )
+        return _pipeline_executor
+
+
+def record_usage(usage, label="request"):
+    note_call(label, usage)
+    with _usage_lock:
+        _usage_totals["requests"] += 1
+        if usage is None:
+            return
+        for key, value in usage_tokens(usage).items():
+            _usage_totals[key] += value
+
+
+def usage_totals():
+    with _usage_lock:
+        return dict(_usage_totals)
+
+
+def configure_caches(path=None):
+    global _statblock_cache, _spell_summary_store
+    with _cache_lock:
+        _statblock_cache = StatblockCache(path)
+        _spell_summary_store = SpellSummaryStore(path)
+
+
+def get_statblock_cache():
+    global _statblock_cache
+    with _cache_lock:
+        if _statblock_cache is None:
+            _statblock_cache = StatblockCache()
+        return _statblock_cache
+
+
+def get_spell_summary_store():
+    global _spell_summary_store
+    with _cache_lock:
+        if _spell_summary_store is None:
+            _spell_summary_store = SpellSummaryStore()
+        return _spell_summary_store
+
+
+def get_npc_library():
+    global _npc_library
+    with _cache_lock:
+        if _npc_library is None:
+            _npc_library = NpcLibrary()
+        return _npc_library
+
+
+def save_to_library(data, formatted, role_description=""):
+    trace = current_trace()
+    source = trace.fields.get("mode", "api") if trace is not None else "api"
+    with stage("library"):
+        return get_npc_library().add(data, formatted, role_description, source)
+
+
+def statblock_prompt_parts(include_spells, combined, rules_engine):
+    spells_requirement = (
+        "Include appropriate spell lists for the NPC.\n"
+        if include_spells
+        else "Do NOT include spells. Focus on non-magical or simple features.\n"
+    )
+
+    fields = FLAVOR_FIELDS if rules_engine else STATBLOCK_FIELDS
+    if combined and include_spells:
+        spells_requirement = COMBINED_SPELLS_REQUIREMENT
+        fields = fields_with_summaries(fields)
+
+    return spells_requirement, fields
+
+
+def prompt_style():
+    return "compact" if COMPACT_PROMPT else "full"
+
+
+def statblock_prompt_template():
+    return COMPACT_STATBLOCK_PROMPT_TEMPLATE if COMPACT_PROMPT else STATBLOCK_PROMPT_TEMPLATE
+
+
+def statblock_static_prompt(fields):
+    """The part of the statblock prompt shared by every NPC with these fields."""
+    if COMPACT_PROMPT:
+        return COMPACT_STATBLOCK_PROMPT_TEMPLATE.format(
+            json_requirement=compact_json_requirement(fields)
+        )
+    return STATBLOCK_PROMPT_TEMPLATE.format(json_schema=schema_text(fields))
+
+
+def compact_json_requirement(fields):
+    if STRUCTURED_OUTPUT:
+        return ""
+    example = json.dumps(example_value(fields), separators=(",", ":"))
+    return f"Return only this JSON object, no markdown: {example}\n"
+
+
+def statblock_max_tokens(level, include_spells, combined, rules_engine):
+    """Output budget for one statblock, growing with level and spells."""
+    try:
+        level = min(max(int(level), 1), 20)
+    except (TypeError, ValueError):
+        level = 20
+
+    cap = OUTPUT_CAP_BASE + OUTPUT_CAP_PER_LEVEL * level
+    if not rules_engine:
+        cap += OUTPUT_CAP_MECHANICS
+    if include_spells:
+        cap += OUTPUT_CAP_SPELLS_PER_LEVEL * level
+        if combined:
+            cap += OUTPUT_CAP_SUMMARIES_PER_LEVEL * level
+    return cap
+
+
+def statblock_template_hash(include_spells, combined, rules_engine):
+    spells_requirement, fields = statblock_prompt_parts(
+        include_spells, combined, rules_engine
+    )
+    return hash_text(
+        STATBLOCK_SYSTEM_PROMPT,
+        statblock_prompt_template(),
+        STATBLOCK_NPC_TEMPLATE,
+        schema_text(fields),
+        spells_requirement,
+        MECHANICS_TEXT_TEMPLATE if rules_engine else "",
+        STRUCTURED_OUTPUT
+    )
+
+
+def with_mechanics(data, mechanics):
+    if mechanics is None or not isinstance(data, dict):
+        return data
+
+    merged = {}
+    if "name" in data:
+        merged["name"] = data["name"]
+    merged.update(mechanics)
+    for key, value in data.items():
+        if key not in merged:
+            merged[key] = value
+    return merged
+
+
+def build_statblock_messages(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells=True,
+    role_description="",
+    combined=False,
+    mechanics=None
+):
+    subclass_text = subclass or "no specific subclass"
+
+    spells_requirement, fields = statblock_prompt_parts(
+        include_spells, combined, mechanics is not None
+    )
+
+    mechanics_text = ""
+    if mechanics is not None:
+        mechanics_text = MECHANICS_TEXT_TEMPLATE.format(
+            summary=mechanics_summary(mechanics)
+        )
+
+    role_text = ""
+    if role_description:
+        role_text = (
+            f'The NPC\'s role / flavor description from the user: '
+            f'"{role_description}".\n'
+        )
+
+    user_prompt = statblock_static_prompt(fields) + STATBLOCK_NPC_TEMPLATE.format(
+        race=race,
+        char_class=char_class,
+        subclass_text=subclass_text,
+        level=level,
+        role_text=role_text,
+        mechanics_text=mechanics_text,
+        spells_requirement=spells_requirement
+    )
+
+    return [
+        {"role": "system", "content": STATBLOCK_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def build_statblock_request(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells=True,
+    role_description="",
+    combined=False,
+    mechanics=None
+):
+    request = {
+        "model": MODEL_NAME,
+        "messages": build_statblock_messages(
+            race, char_class, subclass, level, include_spells, role_description,
+            combined, mechanics
+        ),
+        "temperature": STATBLOCK_TEMPERATURE,
+    }
+    if OUTPUT_CAPS:
+        request["max_tokens"] = statblock_max_tokens(
+            level, include_spells, combined, mechanics is not None
+        )
+    if STRUCTURED_OUTPUT:
+        spells_requirement, fields = statblock_prompt_parts(
+            include_spells, combined, mechanics is not None
+        )
+        request["response_format"] = response_format(fields, "npc_statblock")
+    return request
+
+
+def parse_statblock_content(content):
+    data, complete = salvage_object(content)
+    if data is None:
+        return content.strip()
+    # The last member of a truncated object may be cut short; drop it so it
+    # is requested again with the other missing fields.
+    if not complete and data:
+        data.popitem()
+    return data
+
+
+def statblock_key(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells,
+    role_description,
+    combined,
+    rules_engine
+):
+    """Normalized key of a statblock request, for the cache and single flight."""
+    return statblock_cache_key(
+        race,
+        char_class,
+        subclass,
+        level,
+        include_spells,
+        role_description,
+        MODEL_NAME,
+        STATBLOCK_TEMPERATURE,
+        statblock_template_hash(include_spells, combined, rules_engine)
+    )
+
+
+def lookup_cached_statblock(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells,
+    role_description,
+    fresh,
+    combined=False,
+    rules_engine=False
+):
+    cache = get_statblock_cache()
+    cache_key = statblock_key(
+        race, char_class, subclass, level, include_spells, role_description,
+        combined, rules_engine
+    )
+
+    if fresh:
+        cache.note_bypass()
+        annotate(cached=False)
+        return cache_key, None
+
+    with stage("cache"):
+        cached = cache.get(cache_key)
+    annotate(cached=cached is not None)
+    return cache_key, cached
+
+
+def extract_spell_summaries(data):
+    spells = data.get("spells")
+    if not isinstance(spells, list):
+        return data
+
+    names = []
+    summaries = {}
+    for sp in spells:
+        if isinstance(sp, dict):
+            name = str(sp.get("name", "")).strip()
+            if not name:
+                continue
+            summary = str(sp.get("summary", "")).strip()
+            if summary:
+                summaries[name] = summary
+            names.append(name)
+        else:
+            names.append(sp)
+
+    if summaries:
+        get_spell_summary_store().put_many(summaries)
+    data["spells"] = names
+    return data
+
+
+def check_statblock(content, include_spells, rules_engine):
+    """Parse a statblock response and list the fields it still lacks.
+
+    Returns (data, missing). data is the raw text when no JSON object can
+    be recovered; missing names the top-level fields that are absent or
+    could not be repaired.
+    """
+    data = parse_statblock_content(content)
+    if not isinstance(data, dict):
+        return data, []
+
+    data = extract_spell_summaries(data)
+    if not include_spells:
+        data.setdefault("spells", [])
+
+    fields = FLAVOR_FIELDS if rules_engine else STATBLOCK_FIELDS
+    data, problems = validate_and_repair(data, fields)
+    return data, problem_fields(problems, fields)
+
+
+def build_missing_fields_request(
+    request,
+    content,
+    missing,
+    include_spells,
+    combined,
+    rules_engine
+):
+    spells_requirement, fields = statblock_prompt_parts(
+        include_spells, combined, rules_engine
+    )
+    fields = {key: fields[key] for key in missing}
+
+    followup = dict(request)
+    followup["messages"] = request["messages"] + [
+        {"role": "assistant", "content": content},
+        {
+            "role": "user",
+            "content": MISSING_FIELDS_PROMPT_TEMPLATE.format(
+                json_schema=schema_text(fields)
+            )
+        }
+    ]
+    if STRUCTURED_OUTPUT:
+        followup["response_format"] = response_format(
+            fields, "npc_statblock_fields"
+        )
+    return followup
+
+
+def merge_missing_fields(data, content, missing, rules_engine):
+    extra = parse_statblock_content(content)
+    if isinstance(extra, dict):
+        extra = extract_spell_summaries(extra)
+        for key in missing:
+            if key in extra:
+                data[key] = extra[key]
+
+    fields = FLAVOR_FIELDS if rules_engine else STATBLOCK_FIELDS
+    data, problems = validate_and_repair(data, fields)
+    return data, problem_fields(problems, fields)
+
+
+def complete_statblock(request, content, include_spells, combined, rules_engine):
+    with stage("parse"):
+        data, missing = check_statblock(content, include_spells, rules_engine)
+    if not missing:
+        return data, missing
+
+    extra = create_completion(
+        build_missing_fields_request(
+            request, content, missing, include_spells, combined, rules_engine
+        ),
+        "missing_fields"
+    )
+    with stage("parse"):
+        return merge_missing_fields(data, extra, missing, rules_engine)
+
+
+async def acomplete_statblock(
+    request,
+    content,
+    include_spells,
+    combined,
+    rules_engine
+):
+    with stage("parse"):
+        data, missing = check_statblock(content, include_spells, rules_engine)
+    if not missing:
+        return data, missing
+
+    extra = await acreate_completion(
+        build_missing_fields_request(
+            request, content, missing, include_spells, combined, rules_engine
+        ),
+        "missing_fields"
+    )
+    with stage("parse"):
+        return merge_missing_fields(data, extra, missing, rules_engine)
+
+
+def store_statblock(cache_key, data, missing):
+    # Only complete statblocks are cached, so a retry can do better.
+    if isinstance(data, dict) and not missing:
+        get_statblock_cache().put(cache_key, data)
+    return data
+
+
+def generate_statblock_from_ai(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells=True,
+    role_description="",
+    fresh=False,
+    on_update=None,
+    on_field=None,
+    combined=False,
+    rules_engine=None
+):
+    race, char_class, subclass = canonical_spec(race, char_class, subclass)
+    if rules_engine is None:
+        rules_engine = RULES_ENGINE
+    rules_engine = rules_engine and rules_apply(race, char_class)
+
+    def generate():
+        return request_statblock(
+            race, char_class, subclass, level, include_spells, role_description,
+            fresh, on_update, on_field, combined, rules_engine
+        )
+
+    # A fresh variant is meant to differ, so it is never shared.
+    if fresh:
+        return generate()
+    key = statblock_key(
+        race, char_class, subclass, level, include_spells, role_description,
+        combined, rules_engine
+    )
+    # A joined request delivers no partial statblocks, so a caller that
+    # shows them never waits on someone else's. (on_field only starts the
+    # spell summaries early; a joiner requests them afterwards instead.)
+    return single_flight.do(("statblock", key), generate, join=on_update is None)
+
+
+def request_statblock(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells,
+    role_description,
+    fresh,
+    on_update,
+    on_field,
+    combined,
+    rules_engine
+):
+    mechanics = None
+    if rules_engine:
+        mechanics = compute_mechanics(race, char_class, subclass, level)
+
+    cache_key, cached = lookup_cached_statblock(
+        race, char_class, subclass, level, include_spells, role_description,
+        fresh, combined, rules_engine
+    )
+    if cached is not None:
+        return with_mechanics(cached, mechanics)
+
+    with stage("prompt"):
+        request = build_statblock_request(
+            race, char_class, subclass, level, include_spells, role_description,
+            combined, mechanics
+        )
+
+    if on_update is not None or on_field is not None:
+        stream_update = on_update
+        if on_update is not None and mechanics is not None:
+            on_update(dict(mechanics))
+
+            def stream_update(partial):
+                on_update(with_mechanics(partial, mechanics))
+
+        content = stream_statblock_content(request, stream_update, on_field)
+    else:
+        content = create_completion(request, "statblock")
+
+    data, missing = complete_statblock(
+        request, content, include_spells, combined, rules_engine
+    )
+    return with_mechanics(store_statblock(cache_key, data, missing), mechanics)
+
+
+def stream_statblock_content(request, on_update=None, on_field=None):
+    # Streams are retried but never hedged: two streams would both drive
+    # on_update and on_field.
+    with stage("model:statblock_stream"):
+        return call_with_retries(
+            lambda timeout: read_completion_stream(
+                request, timeout, "statblock_stream", on_update, on_field
+            ),
+            retry_policy,
+            request_stats,
+            "statblock_stream",
+            hedge=False
+        )
+
+
+def read_completion_stream(request, timeout, label, on_update=None, on_field=None):
+    stream = get_client().chat.completions.create(
+        **request,
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=timeout
+    )
+
+    # httpx applies timeout to each read, so a stream that keeps sending a
+    # byte now and then would outlive the attempt; close it on time.
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        stream.close()
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    timer.start()
+
+    parser = IncrementalObjectParser() if on_update or on_field else None
+    partial = {}
+    parts = []
+    try:
+        with on_cancel(stream.close):
+            for chunk in stream:
+                if chunk.usage is not None:
+                    record_usage(chunk.usage, label)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                if parser is None:
+                    continue
+                events = parser.feed(delta)
+                if not events:
+                    continue
+                apply_events(partial, events)
+                if on_field is not None:
+                    for kind, key, value in events:
+                        if kind == "field":
+                            on_field(key, value)
+                if on_update is not None:
+                    on_update(dict(partial))
+    except Exception as error:
+        # Content from a cancelled stream is dropped. Otherwise, once
+        # content has arrived, keep it: the salvage parser and a
+        # missing-fields request finish the statblock faster than a restart.
+        check_cancelled()
+        if expired.is_set():
+            if not parts:
+                raise AttemptTimeout(
+                    f"stream not finished within {timeout:.1f}s"
+                ) from error
+        elif not parts or not is_retryable(error):
+            raise
+    finally:
+        timer.cancel()
+        stream.close()
+    check_cancelled()
+    if expired.is_set() and not parts:
+        raise AttemptTimeout(f"stream not finished within {timeout:.1f}s")
+
+    return "".join(parts)
+
+
+async def agenerate_statblock_from_ai(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells=True,
+    role_description="",
+    fresh=False,
+    combined=False,
+    rules_engine=None
+):
+    race, char_class, subclass = canonical_spec(race, char_class, subclass)
+    if rules_engine is None:
+        rules_engine = RULES_ENGINE
+    rules_engine = rules_engine and rules_apply(race, char_class)
+
+    def generate():
+        return arequest_statblock(
+            race, char_class, subclass, level, include_spells, role_description,
+            fresh, combined, rules_engine
+        )
+
+    if fresh:
+        return await generate()
+    key = statblock_key(
+        race, char_class, subclass, level, include_spells, role_description,
+        combined, rules_engine
+    )
+    return await single_flight.ado(("statblock", key), generate)
+
+
+async def arequest_statblock(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells,
+    role_description,
+    fresh,
+    combined,
+    rules_engine
+):
+    mechanics = None
+    if rules_engine:
+        mechanics = compute_mechanics(race, char_class, subclass, level)
+
+    cache_key, cached = lookup_cached_statblock(
+        race, char_class, subclass, level, include_spells, role_description,
+        fresh, combined, rules_engine
+    )
+    if cached is not None:
+        return with_mechanics(cached, mechanics)
+
+    with stage("prompt"):
+        request = build_statblock_request(
+            race, char_class, subclass, level, include_spells, role_description,
+            combined, mechanics
+        )
+    content = await acreate_completion(request, "statblock")
+
+    data, missing = await acomplete_statblock(
+        request, content, include_spells, combined, rules_engine
+    )
+    return with_mechanics(store_statblock(cache_key, data, missing), mechanics)
+
+
+def format_statblock(data):
+    if isinstance(data, Npc):
+        return data.format()
+    if not isinstance(data, dict):
+        return str(data)
+
+    lines = []
+
+    name = data.get("name", "Unnamed")
+    race = data.get("race", "")
+    char_class = data.get("class", "")
+    subclass = data.get("subclass", "")
+    level = data.get("level", "?")
+
+    header = f"{name} (Level {level} {race} {char_class})"
+    lines.append(header)
+    if subclass and str(subclass).lower() != "none":
+        lines.append(f"Subclass: {subclass}")
+    lines.append("-" * len(header))
+
+    hp = data.get("hp", "?")
+    ac = data.get("ac", "?")
+    speed = data.get("speed", "?")
+    stats_line = f"HP: {hp}   AC: {ac}   Speed: {speed}"
+    prof = data.get("proficiency_bonus")
+    if isinstance(prof, int):
+        stats_line += f"   Proficiency: {format_modifier(prof)}"
+    lines.append(stats_line)
+    lines.append("")
+
+    abilities = data.get("abilities", {})
+
+    def _ability_val(key):
+        val = abilities.get(key, "?")
+        if isinstance(val, dict):
+            score = val.get("score")
+            if score is not None:
+                return str(score)
+            return str(val)
+        return str(val)
+
+    if isinstance(abilities, dict) and abilities:
+        lines.append("Abilities")
+        lines.append(
+            "  STR: {STR:>2}   DEX: {DEX:>2}   CON: {CON:>2}".format(
+                STR=_ability_val("STR"),
+                DEX=_ability_val("DEX"),
+                CON=_ability_val("CON"),
+            )
+        )
+        lines.append(
+            "  INT: {INT:>2}   WIS: {WIS:>2}   CHA: {CHA:>2}".format(
+                INT=_ability_val("INT"),
+                WIS=_ability_val("WIS"),
+                CHA=_ability_val("CHA"),
+            )
+        )
+        lines.append("")
+
+    saving_throws = data.get("saving_throws", [])
+    if saving_throws:
+        lines.append("Saving Throws:")
+        lines.append("  " + ", ".join(str(s) for s in saving_throws))
+        lines.append("")
+
+    skills = data.get("skills", [])
+    if skills:
+        lines.append("Skills:")
+        for s in skills:
+            lines.append("  - " + str(s))
+        lines.append("")
+
+    attacks = data.get("attacks", [])
+    if attacks:
+        lines.append("Attacks:")
+        for a in attacks:
+            lines.append("  - " + str(a))
+        lines.append("")
+
+    spells = data.get("spells", [])
+    if spells:
+        lines.append("Spells:")
+        for sp in spells:
+            if isinstance(sp, dict):
+                sp = sp.get("name", sp)
+            lines.append("  - " + str(sp))
+        lines.append("")
+
+    features = data.get("features", [])
+    if features:
+        lines.append("Features:")
+        for f in features:
+            lines.append("  - " + str(f))
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def clean_spell_list(spell_list):
+    if not spell_list:
+        return []
+    return [str(s) for s in spell_list if str(s).strip()]
+
+
+def missing_spell_summaries(spells_clean):
+    known = get_spell_summary_store().get_many(spells_clean)
+
+    missing = []
+    seen = set()
+    for sp in spells_clean:
+        key = normalize_text(sp)
+        if key not in known and key not in seen:
+            seen.add(key)
+            missing.append(sp)
+    return known, missing
+
+
+def merge_spell_summaries(spells_clean, known, fetched):
+    get_spell_summary_store().put_many(fetched)
+    for name, summary in fetched.items():
+        known[normalize_text(name)] = summary
+
+    summaries = {}
+    for sp in spells_clean:
+        summary = known.get(normalize_text(sp))
+        if summary:
+            summaries[sp] = summary
+    return summaries
+
+
+def spell_list_key(spells):
+    # Summaries are merged back by normalized name, so callers that spell
+    # or order the same list differently can share one request.
+    return tuple(sorted({normalize_text(sp) for sp in spells}))
+
+
+def build_spell_summary_request(spells):
+    request = {
+        "model": MODEL_NAME,
+        "messages": build_spell_summary_messages(spells),
+        "temperature": SPELL_SUMMARY_TEMPERATURE,
+    }
+    if OUTPUT_CAPS:
+        request["max_tokens"] = (
+            SPELL_SUMMARY_CAP_BASE + SPELL_SUMMARY_CAP_PER_SPELL * len(spells)
+        )
+    if STRUCTURED_OUTPUT:
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
+def build_spell_summary_messages(spells):
+    return [
+        {"role": "system", "content": SPELL_SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": SPELL_SUMMARY_PROMPT_TEMPLATE.format(spells=spells)}
+    ]
+
+
+def parse_spell_summaries(text):
+    data, complete = salvage_object(text)
+    summaries = (data or {}).get("spell_summaries")
+    if not isinstance(summaries, dict):
+        return {}
+    # Do not store a summary that may have been cut short.
+    if not complete and summaries:
+        summaries.popitem()
+    return {str(k): str(v) for k, v in summaries.items()}
+
+
+def generate_spell_summaries(spell_list):
+    spells_clean = clean_spell_list(spell_list)
+    if not spells_clean:
+        return {}
+
+    known, missing = missing_spell_summaries(spells_clean)
+
+    fetched = {}
+    if missing:
+        fetched = single_flight.do(
+            ("spell_summaries", spell_list_key(missing)),
+            lambda: parse_spell_summaries(
+                create_completion(build_spell_summary_request(missing), "spell_summaries")
+            )
+        )
+
+    return merge_spell_summaries(spells_clean, known, fetched)
+
+
+async def agenerate_spell_summaries(spell_list):
+    spells_clean = clean_spell_list(spell_list)
+    if not spells_clean:
+        return {}
+
+    known, missing = missing_spell_summaries(spells_clean)
+
+    fetched = {}
+    if missing:
+
+        async def fetch():
+            return parse_spell_summaries(
+                await acreate_completion(
+                    build_spell_summary_request(missing), "spell_summaries"
+                )
+            )
+
+        fetched = await single_flight.ado(
+            ("spell_summaries", spell_list_key(missing)), fetch
+        )
+
+    return merge_spell_summaries(spells_clean, known, fetched)
+
+
+def format_spell_summaries(spells, summaries):
+    if summaries:
+        summary_lines = []
+        summary_lines.append("")
+        summary_lines.append("Spell summaries (rules):")
+        summary_lines.append("------------------------")
+        for sp in spells:
+            sp_name = str(sp)
+            line = summaries.get(sp_name)
+            if line:
+                summary_lines.append(f"- {sp_name}: {line}")
+        return "\n" + "\n".join(summary_lines)
+    if spells:
+        return "\n\n(Spell summaries could not be generated.)"
+    return ""
+
+
+def generate_npc(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells=True,
+    role_description="",
+    fresh=False,
+    on_update=None,
+    combined=None,
+    trace=None,
+    cancel=None
+):
+    """Generate one NPC; returns (data, formatted).
+
+    With a CancelToken as cancel, cancel.cancel() (or its timeout) stops
+    the statblock and spell summary requests and raises Cancelled here.
+    """
+    if combined is None:
+        combined = COMBINED_MODE
+
+    with activate_trace(trace), activate_cancel(cancel):
+        annotate(
+            race=race,
+            char_class=char_class,
+            subclass=subclass,
+            level=level,
+            include_spells=include_spells,
+            combined=combined,
+            prompt=prompt_style(),
+            fresh=fresh
+        )
+
+        # Spell summaries are requested as soon as the streamed "spells"
+        # array is complete, so the second call overlaps the rest of the
+        # statblock.
+        summary_jobs = {}
+
+        def on_field(key, value):
+            if key == "spells" and include_spells and "spells" not in summary_jobs:
+                spells = clean_spell_list(value if isinstance(value, list) else [])
+                summary_jobs["spells"] = spells
+                summary_jobs["future"] = get_pipeline_executor().submit(
+                    contextvars.copy_context().run, generate_spell_summaries, spells
+                )
+
+        data = generate_statblock_from_ai(
+            race,
+            char_class,
+            subclass,
+            level,
+            include_spells,
+            role_description,
+            fresh,
+            on_update,
+            on_field if include_spells and not combined else None,
+            combined
+        )
+        check_cancelled()
+
+        with stage("format"):
+            formatted = format_statblock(data)
+
+        if isinstance(data, dict) and include_spells:
+            spells = data.get("spells", [])
+            with stage("spell_summaries"):
+                if summary_jobs.get("spells") == clean_spell_list(spells):
+                    summaries = summary_jobs["future"].result()
+                else:
+                    summaries = generate_spell_summaries(spells)
+            with stage("format"):
+                formatted += format_spell_summaries(spells, summaries)
+
+        check_cancelled()
+        save_to_library(data, formatted, role_description)
+
+    return data, formatted
+
+
+def generate_offline_npc(race, char_class, subclass, level):
+    data = offline_statblock(race, char_class, subclass, level)
+    formatted = format_statblock(data)
+    formatted += "\n(Offline mode: mechanics from the rules engine only.)"
+    return data, formatted
+
+
+async def agenerate_npc(
+    race,
+    char_class,
+    subclass,
+    level,
+    include_spells=True,
+    role_description="",
+    fresh=False,
+    combined=None,
+    trace=None
+):
+    if combined is None:
+        combined = COMBINED_MODE
+
+    with activate_trace(trace):
+        annotate(
+            race=race,
+            char_class=char_class,
+            subclass=subclass,
+            level=level,
+            include_spells=include_spells,
+            combined=combined,
+            prompt=prompt_style(),
+            fresh=fresh
+        )
+
+        data = await agenerate_statblock_from_ai(
+            race,
+            char_class,
+            subclass,
+            level,
+            include_spells,
+            role_description,
+            fresh,
+            combined
+        )
+
+        with stage("format"):
+            formatted = format_statblock(data)
+
+        if isinstance(data, dict) and include_spells:
+            spells = data.get("spells", [])
+            with stage("spell_summaries"):
+                summaries = await agenerate_spell_summaries(spells)
+            with stage("format"):
+                formatted += format_spell_summaries(spells, summaries)
+
+        save_to_library(data, formatted, role_description)
+
+    return data, formatted
@@ -0,0 +1,443 @@
+import copy
+import random
+import re
+
+import npc_core
+from json_stream import salvage_object
+from npc_cancel import activate_cancel, check_cancelled
+from npc_metrics import activate_trace, annotate, stage
+from npc_schema import (
+    FLAVOR_FIELDS,
+    STATBLOCK_FIELDS,
+    response_format,
+    schema_text,
+    problem_fields,
+    validate_and_repair,
+)
+from rules import compute_mechanics, mechanics_summary, offline_statblock
+
+ENCOUNTER_MAX_GROUPS = 10
+ENCOUNTER_MAX_MEMBERS = 40
+
+# Static part first, the roster last (see npc_core.STATBLOCK_PROMPT_TEMPLATE).
+ENCOUNTER_PROMPT_TEMPLATE = """
+You are a Dungeons & Dragons 5e / 2024 encounter designer.
+
+Create stat blocks for the groups of NPCs listed at the end of this
+message. All members of a group share one stat block; every member gets
+its own name.
+
+Requirements:
+- Return {{"groups": [...]}} with one object per group, in the listed order.
+- "names" holds exactly as many distinct names as the group has members.
+- Use the race, class and subclass given for a group. Where one is not
+  given, choose what fits the role. Classes: {classes}.
+- Make the numbers and choices consistent with level and role, and make
+  the groups fit together as one encounter.
+- Keep lists (skills, attacks, spells, features) reasonably short but useful.
+- Give spells only to spellcasters; everyone else gets an empty list.
+
+VERY IMPORTANT:
+- Return ONLY valid JSON.
+- Do NOT wrap it in markdown.
+- Do NOT include ``` or ```json fences.
+
+Each group object:
+
+{json_schema}
+"""
+
+ENCOUNTER_GROUP_TEMPLATE = (
+    "\nGroup {number}: {count} x {role}, level {level}, race: {race}, "
+    "class: {char_class}, subclass: {subclass}\n{mechanics_text}"
+)
+
+ENCOUNTER_NO_SPELLS = "\nDo NOT include spells for any group.\n"
+
+ENCOUNTER_NAMES_TOKENS_PER_MEMBER = 10
+
+_COUNT = re.compile(r"^\s*(\d+)\s*(?:x\b)?\s*", re.IGNORECASE)
+_LEVEL = re.compile(r"\b(?:level|lvl|lv)\.?\s*(\d+)\b|\bL(\d+)\b", re.IGNORECASE)
+_SEPARATORS = re.compile(r"[,;\n]+")
+
+
+def _plural_pattern(name):
+    # "Dwarf" also matches "Dwarfs" and "Dwarves", "Half-Elf" "Half-Elves".
+    pattern = re.escape(name) + r"(?:e?s)?"
+    if name.lower().endswith("f"):
+        pattern += "|" + re.escape(name[:-1]) + "ves"
+    return pattern
+
+
+def _take_name(text, names):
+    """Remove the longest known name (optionally plural) from text."""
+    for name in sorted(names, key=len, reverse=True):
+        pattern = re.compile(
+            r"(?<![\w-])(?:" + _plural_pattern(name) + r")(?![\w-])", re.IGNORECASE
+        )
+        match = pattern.search(text)
+        if match:
+            return name, text[:match.start()] + " " + text[match.end():]
+    return "", text
+
+
+def parse_roster(text):
+    """Parse "4 bandits level 3, 1 captain level 7" into group specs.
+
+    Entries are separated by commas, semicolons or newlines. Each may give
+    a count, a level ("level 3", "lvl 3", "L3") and a known race, class and
+    subclass; the remaining words are the role. Missing race and class are
+    left to the model. Raises ValueError for an unusable roster.
+    """
+    groups = []
+    for entry in _SEPARATORS.split(text or ""):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        count = 1
+        match = _COUNT.match(entry)
+        if match:
+            count = int(match.group(1))
+            entry = entry[match.end():]
+
+        level = 1
+        match = _LEVEL.search(entry)
+        if match:
+            level = int(match.group(1) or match.group(2))
+            entry = entry[:match.start()] + " " + entry[match.end():]
+        if level < 1 or level > 20:
+            raise ValueError(f"level must be between 1 and 20: {entry.strip()!r}")
+        if count < 1:
+            raise ValueError(f"count must be at least 1: {entry.strip()!r}")
+
+        char_class, entry = _take_name(entry, npc_core.CLASSES)
+        subclass, entry = _take_name(
+            entry, npc_core.CLASS_TO_SUBCLASSES.get(char_class, [])
+        )
+        race, entry = _take_name(entry, npc_core.RACES)
+
+        role = " ".join(entry.split()).strip(" -:")
+        if not role:
+            role = " ".join(part for part in (race, subclass, char_class) if part)
+        groups.append({
+            "count": count,
+            "race": race,
+            "char_class": char_class,
+            "subclass": subclass,
+            "level": level,
+            "role": role or "NPC",
+        })
+
+    if not groups:
+        raise ValueError("the roster is empty")
+    if len(groups) > ENCOUNTER_MAX_GROUPS:
+        raise ValueError(f"at most {ENCOUNTER_MAX_GROUPS} groups per encounter")
+    if sum(group["count"] for group in groups) > ENCOUNTER_MAX_MEMBERS:
+        raise ValueError(f"at most {ENCOUNTER_MAX_MEMBERS} NPCs per encounter")
+    return groups
+
+
+def group_fields(rules_engine):
+    """Fields of one group object in the encounter response."""
+    fields = {"names": [str]}
+    if rules_engine:
+        fields.update(race=str, subclass=str)
+        fields["class"] = str
+        base = FLAVOR_FIELDS
+    else:
+        base = STATBLOCK_FIELDS
+    for key, field_type in base.items():
+        if key != "name":
+            fields[key] = field_type
+    return fields
+
+
+def group_mechanics(group):
+    # Only groups with a known class get mechanics up front; the others are
+    # computed once the model has picked a class.
+    if not group["char_class"]:
+        return None
+    return compute_mechanics(
+        group["race"] or "Human", group["char_class"], group["subclass"], group["level"]
+    )
+
+
+def build_encounter_request(groups, include_spells=True, rules_engine=True):
+    fields = group_fields(rules_engine)
+    parts = [
+        ENCOUNTER_PROMPT_TEMPLATE.format(
+            classes=", ".join(npc_core.CLASSES),
+            json_schema=schema_text(fields)
+        )
+    ]
+    for number, group in enumerate(groups, start=1):
+        mechanics_text = ""
+        mechanics = group_mechanics(group) if rules_engine else None
+        if mechanics is not None and group["race"]:
+            mechanics_text = npc_core.MECHANICS_TEXT_TEMPLATE.format(
+                summary=mechanics_summary(mechanics)
+            )
+        parts.append(ENCOUNTER_GROUP_TEMPLATE.format(
+            number=number,
+            count=group["count"],
+            role=group["role"],
+            level=group["level"],
+            race=group["race"] or "your choice",
+            char_class=group["char_class"] or "your choice",
+            subclass=group["subclass"] or "your choice",
+            mechanics_text=mechanics_text
+        ))
+    if not include_spells:
+        parts.append(ENCOUNTER_NO_SPELLS)
+
+    request = {
+        "model": npc_core.MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": npc_core.STATBLOCK_SYSTEM_PROMPT},
+            {"role": "user", "content": "".join(parts)}
+        ],
+        "temperature": npc_core.STATBLOCK_TEMPERATURE,
+    }
+    if npc_core.OUTPUT_CAPS:
+        request["max_tokens"] = sum(
+            npc_core.statblock_max_tokens(
+                group["level"], include_spells, False, rules_engine
+            )
+            + ENCOUNTER_NAMES_TOKENS_PER_MEMBER * group["count"]
+            for group in groups
+        )
+    if npc_core.STRUCTURED_OUTPUT:
+        request["response_format"] = response_format(
+            {"groups": [fields]}, "npc_encounter"
+        )
+    return request
+
+
+def member_names(names, count, role):
+    result = []
+    seen = set()
+    for name in names:
+        name = str(name).strip()
+        if name and name.casefold() not in seen:
+            seen.add(name.casefold())
+            result.append(name)
+    while len(result) < count:
+        result.append(f"{role.title()} {len(result) + 1}")
+    return result[:count]
+
+
+def resolve_group(group, answer, include_spells, rules_engine):
+    """Turn one group object of the response into a shared statblock.
+
+    Returns (statblock without name, names), or None when the answer cannot
+    be used and the group has to be generated on its own. With the rules
+    engine the numbers come from compute_mechanics, so a flavor field that
+    cannot be repaired is emptied instead.
+    """
+    if not isinstance(answer, dict):
+        return None
+    fields = group_fields(rules_engine)
+    answer, problems = validate_and_repair(answer, fields)
+    # A truncated response may lack trailing lists; those can stay empty.
+    broken = [
+        problem for problem in problems
+        if not problem.endswith(": missing")
+        or not isinstance(fields.get(problem.split(":")[0]), list)
+    ]
+
+    char_class = group["char_class"] or npc_core.known_name(
+        answer.get("class"), npc_core.CLASSES
+    )
+    if not char_class or (broken and not rules_engine):
+        return None
+
+    data = {key: value for key, value in answer.items() if key in fields}
+    for key in problem_fields(problems, fields):
+        data[key] = [] if isinstance(fields[key], list) else ""
+    names = data.pop("names")
+    if not include_spells:
+        data["spells"] = []
+
+    race, char_class, subclass = npc_core.canonical_spec(
+        group["race"] or str(answer.get("race") or "").strip() or "Human",
+        char_class,
+        group["subclass"] or str(answer.get("subclass") or "").strip()
+    )
+    data.update(race=race, subclass=subclass, level=group["level"])
+    data["class"] = char_class
+    if rules_engine:
+        data = npc_core.with_mechanics(
+            data, compute_mechanics(race, char_class, subclass, group["level"])
+        )
+    return data, member_names(names, group["count"], group["role"])
+
+
+def generate_group_alone(group, include_spells, rules_engine):
+    char_class = group["char_class"] or random.choice(npc_core.CLASSES)
+    data = npc_core.generate_statblock_from_ai(
+        group["race"] or random.choice(npc_core.RACES),
+        char_class,
+        group["subclass"],
+        group["level"],
+        include_spells,
+        group["role"],
+        rules_engine=rules_engine
+    )
+    if not isinstance(data, dict):
+        raise ValueError(f"no statblock for {group['role']}: {data}")
+    names = [data.pop("name", "")]
+    return data, member_names(names, group["count"], group["role"])
+
+
+def encounter_members(statblocks, summaries):
+    members = []
+    for data, names in statblocks:
+        spells = data.get("spells", [])
+        for name in names:
+            # Each member gets its own lists, so editing one leaves the
+            # rest of the group alone.
+            member = {"name": name, **copy.deepcopy(data)}
+            with stage("format"):
+                formatted = npc_core.format_statblock(member)
+                formatted += npc_core.format_spell_summaries(spells, summaries)
+            members.append((member, formatted))
+    return members
+
+
+def generate_encounter(
+    groups,
+    include_spells=True,
+    rules_engine=None,
+    trace=None,
+    cancel=None
+):
+    """Generate every member of a parsed roster; returns [(data, formatted)].
+
+    One request covers all groups, and one spell summary request covers
+    the distinct spells of the whole encounter (minus those already in the
+    summary store). A group the response leaves out or garbles is generated
+    on its own. Members of a group share a statblock but not a name.
+    """
+    if rules_engine is None:
+        rules_engine = npc_core.RULES_ENGINE
+
+    with activate_trace(trace), activate_cancel(cancel):
+        annotate(
+            groups=len(groups),
+            members=sum(group["count"] for group in groups),
+            include_spells=include_spells
+        )
+        with stage("prompt"):
+            request = build_encounter_request(groups, include_spells, rules_engine)
+        content = npc_core.create_completion(request, "encounter")
+
+        with stage("parse"):
+            answer, complete = salvage_object(content)
+        answers = (answer or {}).get("groups")
+        if not isinstance(answers, list):
+            answers = []
+        # The last group of a truncated response may be cut short; it is
+        # generated on its own instead.
+        if not complete and answers:
+            answers.pop()
+
+        statblocks = []
+        for index, group in enumerate(groups):
+            resolved = None
+            if index < len(answers):
+                with stage("parse"):
+                    resolved = resolve_group(
+                        group, answers[index], include_spells, rules_engine
+                    )
+            if resolved is None:
+                check_cancelled()
+                resolved = generate_group_alone(group, include_spells, rules_engine)
+            statblocks.append(resolved)
+
+        summaries = {}
+        if include_spells:
+            spells = []
+            for data, names in statblocks:
+                spells.extend(data.get("spells", []))
+            with stage("spell_summaries"):
+                summaries = npc_core.generate_spell_summaries(spells)
+
+        check_cancelled()
+        members = encounter_members(statblocks, summaries)
+        for (data, formatted), group in zip(
+            members,
+            (group for group in groups for _ in range(group["count"]))
+        ):
+            npc_core.save_to_library(data, formatted, group["role"])
+
+    return members
+
+
+def offline_encounter(groups):
+    members = []
+    for group in groups:
+        data = offline_statblock(
+            group["race"] or random.choice(npc_core.RACES),
+            group["char_class"] or random.choice(npc_core.CLASSES),
+            group["subclass"],
+            group["level"]
+        )
+        for name in member_names([], group["count"], group["role"]):
+            member = {"name": name, **copy.deepcopy(data)}
+            formatted = npc_core.format_statblock(member)
+            formatted += "\n(Offline mode: mechanics from the rules engine only.)"
+            members.append((member, formatted))
+    return members
+
+
+def main(argv):
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog="Main.py encounter",
+        description=(
+            "Generate a group of NPCs in one request, "
+            'e.g. "4 bandits level 3, 1 Human Fighter captain level 7".'
+        )
+    )
+    parser.add_argument("roster", help="comma-separated groups")
+    parser.add_argument(
+        "-o", "--output",
+        default=None,
+        help="write batch-style JSONL here instead of printing statblocks"
+    )
+    parser.add_argument("--no-spells", action="store_true", help="leave out spells")
+    args = parser.parse_args(argv)
+
+    try:
+        groups = parse_roster(args.roster)
+    except ValueError as e:
+        print(f"Invalid roster: {e}", file=sys.stderr)
+        return 1
+
+    from npc_metrics import GenerationTrace, log_trace
+
+    trace = GenerationTrace(mode="encounter")
+    try:
+        members = generate_encounter(groups, not args.no_spells, trace=trace)
+    except Exception as e:
+        log_trace(trace, f"{type(e).__name__}: {e}")
+        print(f"Encounter failed: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    log_trace(trace)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for index, (data, formatted) in enumerate(members):
+                record = {"index": index, "npc": data, "statblock": formatted}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        print("\n\n".join(formatted for _, formatted in members))
+    print(
+        f"Generated {len(members)} NPCs in {trace.summary()}",
+        file=sys.stderr
+    )
+    return 0
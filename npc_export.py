@@ -0,0 +1,309 @@
+"""Stream NPC collections to JSONL, CSV, Markdown, HTML or Foundry VTT actors.
+
+Sources and writers are generators over (data, statblock) pairs, and the
+output file is written through a large buffer, so an export of any size
+keeps only one NPC in memory at a time. Writers other than JSONL build an
+Npc per record, which validates the fields once.
+
+Foundry VTT's "Import Data" takes one actor document per file, so the
+Foundry export is a zip archive with one actor JSON file per NPC; unpack
+it and import each file into a new actor.
+"""
+import csv
+import html
+import json
+import os
+import re
+import sys
+import zipfile
+
+from npc_model import LIST_FIELDS, Npc
+from npc_schema import ABILITY_ALIASES
+from npc_render import render_many
+from rules import ABILITIES
+
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+CSV_FIELDS = (
+    ["name", "race", "class", "subclass", "level", "hp", "ac", "speed",
+     "proficiency_bonus"]
+    + list(ABILITIES)
+    + list(LIST_FIELDS)
+)
+LIST_SEPARATOR = "; "
+
+FOUNDRY_SKILLS = {
+    "acrobatics": "acr",
+    "animal handling": "ani",
+    "arcana": "arc",
+    "athletics": "ath",
+    "deception": "dec",
+    "history": "his",
+    "insight": "ins",
+    "intimidation": "itm",
+    "investigation": "inv",
+    "medicine": "med",
+    "nature": "nat",
+    "perception": "prc",
+    "performance": "prf",
+    "persuasion": "per",
+    "religion": "rel",
+    "sleight of hand": "slt",
+    "stealth": "ste",
+    "survival": "sur",
+}
+FOUNDRY_DEFAULT_IMAGE = "icons/svg/mystery-man.svg"
+
+_LEADING_INT = re.compile(r"\d+")
+_FILE_NAME_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+_SKILL_NAME = re.compile(r"^\s*([A-Za-z][A-Za-z ]*?)\s*(?:[+-]\d+)?\s*$")
+
+
+def leading_int(value, default=0):
+    if isinstance(value, int):
+        return value
+    match = _LEADING_INT.search(str(value or ""))
+    return int(match.group()) if match else default
+
+
+# Sources
+
+def batch_records(path):
+    """NPCs from a 'Main.py batch' output file, skipping failed rows."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record.get("npc"), dict):
+                yield record["npc"], record.get("statblock") or ""
+
+
+# Writers. Each takes an iterable of (data, statblock) and a text file (a
+# binary one for BINARY_FORMATS) and returns the number of NPCs written.
+
+def write_jsonl(records, out):
+    count = 0
+    for data, statblock in records:
+        out.write(json.dumps(data, ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def csv_row(npc):
+    row = {
+        "name": npc.name,
+        "race": npc.race,
+        "class": npc.char_class,
+        "subclass": npc.subclass,
+        "level": npc.level,
+        "hp": npc.hp,
+        "ac": npc.ac,
+        "speed": npc.speed,
+        "proficiency_bonus": npc.proficiency_bonus,
+    }
+    for ability in ABILITIES:
+        row[ability] = npc.ability(ability)
+    for key in LIST_FIELDS:
+        row[key] = LIST_SEPARATOR.join(getattr(npc, key))
+    return row
+
+
+def write_csv(records, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for data, statblock in records:
+        writer.writerow(csv_row(Npc.from_dict(data)))
+        count += 1
+    return count
+
+
+def write_markdown(records, out):
+    return render_many((data for data, statblock in records), out, "markdown")
+
+
+def write_html(records, out):
+    return render_many((data for data, statblock in records), out, "html")
+
+
+def foundry_item(name, item_type, description=""):
+    return {
+        "name": name,
+        "type": item_type,
+        "system": {"description": {"value": description}},
+    }
+
+
+def foundry_actor(npc, statblock=""):
+    """A dnd5e-system NPC actor document for Foundry VTT."""
+    saves = set()
+    for entry in npc.saving_throws:
+        words = entry.split()
+        if words:
+            ability = words[0].upper()
+            saves.add(ABILITY_ALIASES.get(ability, ability))
+
+    system_abilities = {}
+    for ability in ABILITIES:
+        score = npc.ability(ability)
+        system_abilities[ability.lower()] = {
+            "value": 10 if score is None else score,
+            "proficient": 1 if ability in saves else 0,
+        }
+
+    skills = {}
+    for entry in npc.skills:
+        match = _SKILL_NAME.match(entry)
+        key = FOUNDRY_SKILLS.get(match.group(1).lower()) if match else None
+        if key:
+            skills[key] = {"value": 1}
+
+    hp = npc.hp if npc.hp is not None else 1
+    items = [foundry_item(name, "weapon") for name in npc.attacks]
+    items += [foundry_item(name, "spell") for name in npc.spells]
+    items += [foundry_item(name, "feat") for name in npc.features]
+
+    biography = ""
+    if statblock:
+        biography = "<pre>" + html.escape(statblock) + "</pre>"
+
+    return {
+        "name": npc.name,
+        "type": "npc",
+        "img": FOUNDRY_DEFAULT_IMAGE,
+        "system": {
+            "abilities": system_abilities,
+            "attributes": {
+                "ac": {"calc": "flat", "flat": npc.ac if npc.ac is not None else 10},
+                "hp": {"value": hp, "max": hp},
+                "movement": {"walk": leading_int(npc.speed, 30), "units": "ft"},
+            },
+            "details": {
+                "type": {"value": "humanoid", "subtype": npc.race},
+                "biography": {"value": biography},
+            },
+            "skills": skills,
+        },
+        "items": items,
+        "flags": {"dnd-npc-generator": {"class": npc.char_class,
+                                        "subclass": npc.subclass,
+                                        "level": npc.level}},
+    }
+
+
+def foundry_file_name(npc, index):
+    # Named like Foundry's own exports; the index keeps namesakes apart.
+    slug = _FILE_NAME_UNSAFE.sub("-", npc.name).strip("-") or "NPC"
+    return f"fvtt-Actor-{slug}-{index:04d}.json"
+
+
+def write_foundry(records, out):
+    # out is binary: a zip with one actor document per entry, added as
+    # each NPC is converted.
+    count = 0
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        for data, statblock in records:
+            npc = Npc.from_dict(data)
+            count += 1
+            archive.writestr(
+                foundry_file_name(npc, count),
+                json.dumps(foundry_actor(npc, statblock), ensure_ascii=False, indent=2)
+            )
+    return count
+
+
+EXPORT_FORMATS = {
+    "jsonl": (write_jsonl, ".jsonl"),
+    "csv": (write_csv, ".csv"),
+    "md": (write_markdown, ".md"),
+    "html": (write_html, ".html"),
+    "foundry": (write_foundry, ".foundry.zip"),
+}
+
+# Written through a binary file rather than text.
+BINARY_FORMATS = {"foundry"}
+
+
+def format_for_path(path):
+    lower = path.lower()
+    for name, (writer, extension) in sorted(
+        EXPORT_FORMATS.items(), key=lambda item: -len(item[1][1])
+    ):
+        if lower.endswith(extension):
+            return name
+    return None
+
+
+def export_npcs(records, path, export_format=None):
+    """Write records to path in export_format (guessed from the extension)."""
+    export_format = export_format or format_for_path(path)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format for {path!r}")
+    writer = EXPORT_FORMATS[export_format][0]
+
+    if export_format in BINARY_FORMATS:
+        mode, encoding, newline = "wb", None, None
+    else:
+        mode, encoding = "w", "utf-8"
+        newline = "" if export_format == "csv" else None
+    tmp_path = path + ".part"
+    try:
+        with open(
+            tmp_path, mode, encoding=encoding, newline=newline, buffering=WRITE_BUFFER_BYTES
+        ) as out:
+            count = writer(records, out)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Only replace the target once the export is complete.
+    os.replace(tmp_path, path)
+    return count
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="Main.py export",
+        description=(
+            "Export stored or batch-generated NPCs. The foundry format is a "
+            ".zip with one dnd5e actor JSON file per NPC; unpack it and use "
+            "Import Data on a new actor for each file."
+        )
+    )
+    parser.add_argument("output", help="output file (.jsonl, .csv, .md, .html or .foundry.zip)")
+    parser.add_argument("-f", "--format", choices=sorted(EXPORT_FORMATS), default=None)
+    parser.add_argument("--from-batch", metavar="JSONL", help="export a batch output file instead of the library")
+    parser.add_argument("--search", default="", help="full-text filter on the library")
+    parser.add_argument("--race", default=None)
+    parser.add_argument("--class", dest="char_class", default=None)
+    parser.add_argument("--subclass", default=None)
+    parser.add_argument("--level", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.from_batch:
+        records = batch_records(args.from_batch)
+    else:
+        from npc_library import NpcLibrary
+
+        records = NpcLibrary().iter_npcs(
+            text=args.search,
+            race=args.race,
+            char_class=args.char_class,
+            subclass=args.subclass,
+            level=args.level
+        )
+
+    try:
+        count = export_npcs(records, args.output, args.format)
+    except (OSError, ValueError) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Exported {count} NPCs -> {args.output}", file=sys.stderr)
+    return 0
@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from npc_cache import app_data_dir, hash_text
+
+DEFAULT_SEARCH_LIMIT = 200
+EXPORT_BATCH_SIZE = 500
+
+# Columns of the full-text index; list fields are joined into one string.
+FTS_FIELDS = ("name", "features", "attacks", "spells")
+
+
+def fts_text(value):
+    if isinstance(value, list):
+        return "\n".join(
+            str(item.get("name", item)) if isinstance(item, dict) else str(item)
+            for item in value
+        )
+    return "" if value is None else str(value)
+
+
+def fts_query(text):
+    # Every word must match, as a prefix, so "fire bo" finds "Fire Bolt".
+    terms = []
+    for word in text.split():
+        word = word.replace('"', "")
+        if word:
+            terms.append(f'"{word}"*')
+    return " AND ".join(terms)
+
+
+class NpcLibrary:
+    """Every generated NPC, kept on disk and searchable.
+
+    NPCs are deduplicated by content, so a statblock served from the cache
+    again does not add a second row.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), "library.sqlite3")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS npcs ("
+                " id INTEGER PRIMARY KEY,"
+                " content_hash TEXT NOT NULL UNIQUE,"
+                " created_at REAL NOT NULL,"
+                " name TEXT NOT NULL COLLATE NOCASE,"
+                " race TEXT NOT NULL COLLATE NOCASE,"
+                " class TEXT NOT NULL COLLATE NOCASE,"
+                " subclass TEXT NOT NULL COLLATE NOCASE,"
+                " level INTEGER,"
+                " role TEXT NOT NULL,"
+                " source TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " statblock TEXT NOT NULL)"
+            )
+            for column in ("race", "class", "subclass", "level", "created_at"):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS npcs_{column} ON npcs ({column})"
+                )
+            try:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS npcs_fts USING fts5("
+                    + ", ".join(FTS_FIELDS)
+                    + ", tokenize='unicode61 remove_diacritics 2')"
+                )
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: fall back to LIKE on the name.
+                self.has_fts = False
+
+    def add(self, data, statblock, role_description="", source="gui"):
+        if not isinstance(data, dict):
+            return None
+
+        content_hash = hash_text(json.dumps(data, sort_keys=True))
+        level = data.get("level")
+        row = (
+            content_hash,
+            time.time(),
+            str(data.get("name") or "Unnamed"),
+            str(data.get("race") or ""),
+            str(data.get("class") or ""),
+            str(data.get("subclass") or ""),
+            level if isinstance(level, int) else None,
+            role_description or "",
+            source,
+            json.dumps(data),
+            statblock,
+        )
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO npcs (content_hash, created_at, name,"
+                    " race, class, subclass, level, role, source, data, statblock)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                if cursor.rowcount == 0:
+                    return None
+                npc_id = cursor.lastrowid
+                if self.has_fts:
+                    self._conn.execute(
+                        "INSERT INTO npcs_fts (rowid, "
+                        + ", ".join(FTS_FIELDS)
+                        + ") VALUES (?, ?, ?, ?, ?)",
+                        (npc_id, *(fts_text(data.get(f)) for f in FTS_FIELDS))
+                    )
+                return npc_id
+        except sqlite3.Error:
+            return None
+
+    def _filters(self, text, race, char_class, subclass, level):
+        where = []
+        params = []
+        for column, value in (
+            ("race", race),
+            ("class", char_class),
+            ("subclass", subclass),
+            ("level", level),
+        ):
+            if value not in (None, ""):
+                where.append(f"npcs.{column} = ?")
+                params.append(value)
+
+        query = fts_query(text or "")
+        if query and self.has_fts:
+            # A subquery (not a join) lets SQLite combine the FTS matches
+            # with the column indexes instead of probing FTS row by row.
+            where.append(
+                "npcs.id IN (SELECT rowid FROM npcs_fts WHERE npcs_fts MATCH ?)"
+            )
+            params.append(query)
+        elif query:
+            for word in text.split():
+                where.append("npcs.name LIKE ?")
+                params.append(f"%{word}%")
+
+        return (" WHERE " + " AND ".join(where) if where else ""), params
+
+    def search(
+        self,
+        text="",
+        race=None,
+        char_class=None,
+        subclass=None,
+        level=None,
+        limit=DEFAULT_SEARCH_LIMIT
+    ):
+        """Newest matching NPCs as (id, name, race, class, subclass, level, created_at)."""
+        where, params = self._filters(text, race, char_class, subclass, level)
+        # Ids grow with created_at, so the rowid gives newest first for free.
+        sql = (
+            "SELECT npcs.id, npcs.name, npcs.race, npcs.class, npcs.subclass,"
+            " npcs.level, npcs.created_at FROM npcs" + where
+            + " ORDER BY npcs.id DESC LIMIT ?"
+        )
+
+        try:
+            with self._lock:
+                return self._conn.execute(sql, params + [limit]).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def iter_npcs(
+        self,
+        ids=None,
+        text="",
+        race=None,
+        char_class=None,
+        subclass=None,
+        level=None,
+        batch_size=EXPORT_BATCH_SIZE
+    ):
+        """Yield (data, statblock) for the given ids or for every match, oldest first.
+
+        Rows are fetched batch_size at a time on a separate connection, so
+        exports of any size run in constant memory without holding the
+        library lock.
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            if ids is not None:
+                ids = list(ids)
+                for start in range(0, len(ids), batch_size):
+                    chunk = ids[start:start + batch_size]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    rows = conn.execute(
+                        "SELECT data, statblock FROM npcs "
+                        f"WHERE id IN ({placeholders}) ORDER BY id",
+                        chunk
+                    ).fetchall()
+                    for data, statblock in rows:
+                        yield json.loads(data), statblock
+                return
+
+            where, params = self._filters(text, race, char_class, subclass, level)
+            cursor = conn.execute(
+                "SELECT npcs.data, npcs.statblock FROM npcs" + where
+                + " ORDER BY npcs.id",
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for data, statblock in rows:
+                    yield json.loads(data), statblock
+        finally:
+            conn.close()
+
+    def get(self, npc_id):
+        """Return (data, statblock) for an NPC, or None."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data, statblock FROM npcs WHERE id = ?",
+                    (npc_id,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def count(self):
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM npcs").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
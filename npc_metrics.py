@@ -0,0 +1,350 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from npc_cache import app_data_dir
+
+METRICS_MAX_BYTES = 1024 * 1024
+METRICS_BACKUP_COUNT = 3
+
+# Set NPC_METRICS=0 to stop writing the metrics log.
+METRICS_ENABLED = os.getenv("NPC_METRICS", "1") != "0"
+
+# cached_tokens is the part of prompt_tokens the provider served from its
+# prompt cache (usage.prompt_tokens_details.cached_tokens).
+TOKEN_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens")
+
+_current_trace = contextvars.ContextVar("npc_generation_trace", default=None)
+
+_metrics_log = None
+_metrics_log_lock = threading.Lock()
+
+
+class GenerationTrace:
+    """Wall time per stage and token usage per model call for one NPC.
+
+    Stages that run more than once (or on several threads, like pipelined
+    spell summaries) add up, so stage times may sum to more than total_ms.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_call(self, label, usage):
+        call = {"label": label, **usage_tokens(usage)}
+        with self._lock:
+            self.calls.append(call)
+
+    def annotate(self, **fields):
+        with self._lock:
+            self.fields.update(fields)
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    def total_seconds(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def tokens(self):
+        with self._lock:
+            return {
+                key: sum(call.get(key, 0) for call in self.calls) for key in TOKEN_KEYS
+            }
+
+    def record(self, error=None):
+        with self._lock:
+            record = {
+                "ts": round(time.time(), 3),
+                **self.fields,
+                "total_ms": round(self.total_seconds() * 1000, 1),
+                "stages_ms": {
+                    name: round(seconds * 1000, 1)
+                    for name, seconds in self.stages.items()
+                },
+                "calls": list(self.calls),
+            }
+        record["tokens"] = self.tokens()
+        if error is not None:
+            record["error"] = error
+        return record
+
+    def summary(self):
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1])
+        parts = [f"{name} {format_seconds(seconds)}" for name, seconds in stages[:4]]
+        tokens = self.tokens()
+        text = f"{format_seconds(self.total_seconds())} total"
+        if parts:
+            text += " (" + ", ".join(parts) + ")"
+        if tokens["total_tokens"]:
+            text += f", {tokens['total_tokens']} tokens"
+            if tokens["cached_tokens"]:
+                text += f" ({tokens['cached_tokens']} cached)"
+        return text
+
+
+def usage_tokens(usage):
+    """Token counts of one response's usage object (None counts as zero)."""
+    tokens = {key: getattr(usage, key, 0) or 0 for key in TOKEN_KEYS[:3]}
+    details = getattr(usage, "prompt_tokens_details", None)
+    tokens["cached_tokens"] = getattr(details, "cached_tokens", 0) or 0
+    return tokens
+
+
+def format_seconds(seconds):
+    if seconds < 0.01:
+        return f"{seconds * 1000:.1f}ms"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    return f"{seconds:.2f}s"
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def activate_trace(trace):
+    if trace is None:
+        return nullcontext()
+    return trace.activate()
+
+
+def stage(name):
+    trace = _current_trace.get()
+    if trace is None:
+        return nullcontext()
+    return trace.stage(name)
+
+
+def note_call(label, usage):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_call(label, usage)
+
+
+def annotate(**fields):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.annotate(**fields)
+
+
+def metrics_log_path():
+    return os.path.join(app_data_dir(), "metrics.jsonl")
+
+
+class MetricsLog:
+    def __init__(
+        self,
+        path=None,
+        max_bytes=METRICS_MAX_BYTES,
+        backup_count=METRICS_BACKUP_COUNT
+    ):
+        self.path = path or metrics_log_path()
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if (
+                    os.path.exists(self.path)
+                    and os.path.getsize(self.path) + len(line) > self.max_bytes
+                ):
+                    self.rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+    def rotate(self):
+        # metrics.jsonl -> metrics.jsonl.1 -> ... -> metrics.jsonl.<backup_count>
+        for index in range(self.backup_count - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def get_metrics_log():
+    global _metrics_log
+    with _metrics_log_lock:
+        if _metrics_log is None and METRICS_ENABLED:
+            _metrics_log = MetricsLog()
+        return _metrics_log
+
+
+def log_trace(trace, error=None):
+    trace.finish()
+    log = get_metrics_log()
+    if log is not None:
+        log.append(trace.record(error))
+
+
+def read_records(path):
+    import glob
+
+    # Oldest rotated file first, so records come out in write order.
+    paths = sorted(glob.glob(glob.escape(path) + ".*"), reverse=True) + [path]
+    for file_path in paths:
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except OSError:
+            continue
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+def report_row(label, samples, fmt):
+    import statistics
+
+    if not samples:
+        return None
+    return (
+        f"{label:<28}"
+        + "".join(
+            f"{fmt(percentile(samples, q)):>10}" for q in (0.5, 0.95, 0.99)
+        )
+        + f"{fmt(statistics.mean(samples)):>10}"
+    )
+
+
+def aggregate(records):
+    ok = [r for r in records if "error" not in r]
+    rows = []
+
+    def seconds(ms):
+        return format_seconds(ms / 1000)
+
+    def count(value):
+        return f"{value:,.0f}"
+
+    rows.append(report_row("total", [r["total_ms"] for r in ok], seconds))
+    stage_names = sorted({name for r in ok for name in r.get("stages_ms", {})})
+    for name in stage_names:
+        rows.append(report_row(
+            f"  {name}",
+            [r["stages_ms"][name] for r in ok if name in r.get("stages_ms", {})],
+            seconds
+        ))
+
+    generated = [r for r in ok if r.get("calls")]
+    labels = sorted({call["label"] for r in generated for call in r["calls"]})
+    for key in TOKEN_KEYS:
+        rows.append(report_row(
+            f"{key.replace('_', ' ')}/NPC",
+            [r["tokens"].get(key, 0) for r in generated],
+            count
+        ))
+        if key == "total_tokens":
+            continue
+        # Per request template, so prompt changes can be compared call by call.
+        for label in labels:
+            rows.append(report_row(
+                f"  {label}",
+                [
+                    call.get(key, 0)
+                    for r in generated
+                    for call in r["calls"]
+                    if call["label"] == label
+                ],
+                count
+            ))
+    return [row for row in rows if row is not None]
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="Main.py metrics",
+        description="Summarize generation latency and token usage from the metrics log."
+    )
+    parser.add_argument("--log", default=None, help="metrics JSONL file (default: app data dir)")
+    parser.add_argument("--last", type=int, default=None, help="only use the last N records")
+    parser.add_argument("--mode", default=None, help="only use records from this mode (gui, batch)")
+    parser.add_argument(
+        "--prompt",
+        default=None,
+        help="only use records made with this statblock prompt (full, compact)"
+    )
+    parser.add_argument(
+        "--no-cached",
+        action="store_true",
+        help="leave out statblocks served from the cache"
+    )
+    args = parser.parse_args(argv)
+
+    path = args.log or metrics_log_path()
+    records = list(read_records(path))
+    if args.mode:
+        records = [r for r in records if r.get("mode") == args.mode]
+    if args.prompt:
+        records = [r for r in records if r.get("prompt") == args.prompt]
+    if args.no_cached:
+        records = [r for r in records if not r.get("cached")]
+    if args.last:
+        records = records[-args.last:]
+
+    if not records:
+        print(f"No metrics records in {path}", file=sys.stderr)
+        return 1
+
+    errors = sum(1 for r in records if "error" in r)
+    cached = sum(1 for r in records if r.get("cached"))
+    print(f"{len(records)} NPCs ({errors} errors, {cached} from cache) in {path}")
+    print(f"{'':<28}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}")
+    for row in aggregate(records):
+        print(row)
+
+    prompt_tokens = sum(r.get("tokens", {}).get("prompt_tokens", 0) for r in records)
+    cached_tokens = sum(r.get("tokens", {}).get("cached_tokens", 0) for r in records)
+    if prompt_tokens:
+        print(
+            f"Prompt cache: {cached_tokens:,} of {prompt_tokens:,} prompt tokens "
+            f"cached ({cached_tokens / prompt_tokens:.0%})"
+        )
+    return 0
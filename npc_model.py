@@ -0,0 +1,285 @@
+import json
+import sys
+from array import array
+
+from npc_schema import STATBLOCK_FIELDS, validate_and_repair
+from rules import ABILITIES, format_modifier
+
+LIST_FIELDS = ("saving_throws", "skills", "attacks", "spells", "features")
+
+# Ability scores are stored in ABILITIES order; 0 marks a missing score.
+MISSING_SCORE = 0
+
+
+def _int_or_none(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def _text(value):
+    return sys.intern(value) if isinstance(value, str) else None
+
+
+def _text_tuple(value, intern=False):
+    if not isinstance(value, list):
+        return ()
+    if intern:
+        return tuple(sys.intern(str(item)) for item in value)
+    return tuple(str(item) for item in value)
+
+
+class Npc:
+    """One statblock, validated once and stored compactly.
+
+    Built from a model response (or a stored dict) with from_dict(), which
+    checks the types once and only falls back to validate_and_repair when
+    they do not already match the schema. Afterwards every field has a
+    fixed type, so format_text() and the compiled templates in npc_render
+    read the slots directly without re-checking anything. Race, class,
+    subclass, speed and saving throws repeat across NPCs and are interned;
+    abilities live in a 6-byte array.
+    """
+
+    __slots__ = (
+        "name",
+        "race",
+        "char_class",
+        "subclass",
+        "level",
+        "hp",
+        "ac",
+        "speed",
+        "proficiency_bonus",
+        "abilities",
+        "saving_throws",
+        "skills",
+        "attacks",
+        "spells",
+        "features",
+    )
+
+    def __init__(
+        self,
+        name="Unnamed",
+        race="",
+        char_class="",
+        subclass="",
+        level=None,
+        hp=None,
+        ac=None,
+        speed=None,
+        proficiency_bonus=None,
+        abilities=None,
+        saving_throws=(),
+        skills=(),
+        attacks=(),
+        spells=(),
+        features=()
+    ):
+        self.name = name
+        self.race = race
+        self.char_class = char_class
+        self.subclass = subclass
+        self.level = level
+        self.hp = hp
+        self.ac = ac
+        self.speed = speed
+        self.proficiency_bonus = proficiency_bonus
+        self.abilities = abilities
+        self.saving_throws = saving_throws
+        self.skills = skills
+        self.attacks = attacks
+        self.spells = spells
+        self.features = features
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise TypeError(f"expected a statblock object, got {type(data).__name__}")
+
+        npc = cls._from_valid(data)
+        if npc is None:
+            repaired, _ = validate_and_repair(data, STATBLOCK_FIELDS)
+            npc = cls._from_repaired(repaired)
+        return npc
+
+    @classmethod
+    def _from_valid(cls, data):
+        # Fast path for dicts that already match the schema (our own
+        # to_dict() output, the library, batch files); None otherwise.
+        try:
+            scores = data["abilities"]
+            abilities = array("B", [scores[ability] for ability in ABILITIES])
+            lists = [data[key] for key in LIST_FIELDS]
+            name, race, char_class, subclass, speed = (
+                data["name"], data["race"], data["class"], data["subclass"], data["speed"]
+            )
+            level, hp, ac = data["level"], data["hp"], data["ac"]
+        except (KeyError, TypeError, OverflowError):
+            return None
+
+        if MISSING_SCORE in abilities:
+            return None
+        for value in (name, race, char_class, subclass, speed):
+            if type(value) is not str:
+                return None
+        for value in (level, hp, ac):
+            if type(value) is not int:
+                return None
+        for values in lists:
+            if type(values) is not list:
+                return None
+            for item in values:
+                if type(item) is not str:
+                    return None
+
+        saving_throws, skills, attacks, spells, features = lists
+        return cls(
+            name=name,
+            race=sys.intern(race),
+            char_class=sys.intern(char_class),
+            subclass=sys.intern(subclass),
+            level=level,
+            hp=hp,
+            ac=ac,
+            speed=sys.intern(speed),
+            proficiency_bonus=_int_or_none(data.get("proficiency_bonus")),
+            abilities=abilities,
+            saving_throws=tuple(map(sys.intern, saving_throws)),
+            skills=tuple(skills),
+            attacks=tuple(attacks),
+            spells=tuple(spells),
+            features=tuple(features),
+        )
+
+    @classmethod
+    def _from_repaired(cls, data):
+        abilities = None
+        scores = data.get("abilities")
+        if isinstance(scores, dict) and scores:
+            abilities = array("B", (
+                score if isinstance(score, int) and 0 < score < 256 else MISSING_SCORE
+                for score in (scores.get(ability) for ability in ABILITIES)
+            ))
+
+        return cls(
+            name=_text(data.get("name")) or "Unnamed",
+            race=_text(data.get("race")) or "",
+            char_class=_text(data.get("class")) or "",
+            subclass=_text(data.get("subclass")) or "",
+            level=_int_or_none(data.get("level")),
+            hp=_int_or_none(data.get("hp")),
+            ac=_int_or_none(data.get("ac")),
+            speed=_text(data.get("speed")),
+            proficiency_bonus=_int_or_none(data.get("proficiency_bonus")),
+            abilities=abilities,
+            saving_throws=_text_tuple(data.get("saving_throws"), intern=True),
+            skills=_text_tuple(data.get("skills")),
+            attacks=_text_tuple(data.get("attacks")),
+            spells=_text_tuple(data.get("spells")),
+            features=_text_tuple(data.get("features")),
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_dict(self):
+        data = {
+            "name": self.name,
+            "race": self.race,
+            "class": self.char_class,
+            "subclass": self.subclass,
+            "level": self.level,
+            "hp": self.hp,
+            "ac": self.ac,
+            "speed": self.speed,
+        }
+        if self.proficiency_bonus is not None:
+            data["proficiency_bonus"] = self.proficiency_bonus
+        if self.abilities is not None:
+            data["abilities"] = {
+                ability: score if score != MISSING_SCORE else None
+                for ability, score in zip(ABILITIES, self.abilities)
+            }
+        for key in LIST_FIELDS:
+            data[key] = list(getattr(self, key))
+        return data
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def ability(self, key):
+        """Score for "STR".."CHA", or None when unknown."""
+        if self.abilities is None:
+            return None
+        score = self.abilities[ABILITIES.index(key)]
+        return None if score == MISSING_SCORE else score
+
+    def format(self, render_format="text"):
+        if render_format == "text":
+            return self.format_text()
+
+        from npc_render import render
+
+        return render(self, render_format)
+
+    def format_text(self):
+        # Same text as format_statblock() on the equivalent dict. Written
+        # out rather than compiled from a template: this is the hot path of
+        # text exports, and the direct version is the faster one.
+        def known(value):
+            return "?" if value is None else value
+
+        header = (
+            f"{self.name} (Level {known(self.level)} {self.race} {self.char_class})"
+        )
+        lines = [header]
+        if self.subclass and self.subclass.lower() != "none":
+            lines.append(f"Subclass: {self.subclass}")
+        lines.append("-" * len(header))
+
+        stats_line = (
+            f"HP: {known(self.hp)}   AC: {known(self.ac)}   Speed: {known(self.speed)}"
+        )
+        if self.proficiency_bonus is not None:
+            stats_line += f"   Proficiency: {format_modifier(self.proficiency_bonus)}"
+        lines.append(stats_line)
+        lines.append("")
+
+        if self.abilities is not None:
+            s = [str(score) if score != MISSING_SCORE else "?" for score in self.abilities]
+            lines.append("Abilities")
+            lines.append(f"  STR: {s[0]:>2}   DEX: {s[1]:>2}   CON: {s[2]:>2}")
+            lines.append(f"  INT: {s[3]:>2}   WIS: {s[4]:>2}   CHA: {s[5]:>2}")
+            lines.append("")
+
+        if self.saving_throws:
+            lines.append("Saving Throws:")
+            lines.append("  " + ", ".join(self.saving_throws))
+            lines.append("")
+
+        for title, values in (
+            ("Skills:", self.skills),
+            ("Attacks:", self.attacks),
+            ("Spells:", self.spells),
+            ("Features:", self.features),
+        ):
+            if values:
+                lines.append(title)
+                lines.append("  - " + "\n  - ".join(values))
+                lines.append("")
+
+        return "\n".join(lines)
+
+    def __eq__(self, other):
+        if not isinstance(other, Npc):
+            return NotImplemented
+        return all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __repr__(self):
+        return (
+            f"Npc(name={self.name!r}, level={self.level!r}, "
+            f"race={self.race!r}, char_class={self.char_class!r})"
+        )
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import deque
+
+from npc_cancel import CancelToken, Cancelled
+from npc_core import random_npc_spec
+from npc_metrics import GenerationTrace, log_trace
+
+DEFAULT_POOL_SIZE = 3
+# Tokens the prefetcher may spend in any rolling hour (about 25 NPCs with
+# spell summaries). Set NPC_POOL_TOKEN_BUDGET to change it.
+DEFAULT_TOKEN_BUDGET = 20000
+BUDGET_WINDOW_SECONDS = 60 * 60
+RETRY_DELAY_SECONDS = 30.0
+
+
+def pool_token_budget():
+    try:
+        return int(os.getenv("NPC_POOL_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    except ValueError:
+        return DEFAULT_TOKEN_BUDGET
+
+
+class NpcPool:
+    """Keep a few finished random NPCs ready for the "Random NPC" button.
+
+    A single background thread refills the pool with generate() (called like
+    generate_npc) whenever it is below size and the tokens spent in the last
+    hour are below token_budget. take() never blocks; stop() cancels the
+    generation in progress.
+    """
+
+    def __init__(self, generate, size=DEFAULT_POOL_SIZE, token_budget=None):
+        self.generate = generate
+        self.size = size
+        self.token_budget = pool_token_budget() if token_budget is None else token_budget
+
+        self._ready = deque()
+        self._spent = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._token = None
+
+    def start(self):
+        with self._cond:
+            self._running = True
+            self._cond.notify_all()
+            # A thread stopped mid-generation is still alive and picks up
+            # again once its cancelled generation returns.
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="npc-pool", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            # Abandon the NPC being generated rather than pay for it.
+            if self._token is not None:
+                self._token.cancel("prefetching stopped")
+            self._cond.notify_all()
+
+    def take(self):
+        """Return (spec, data, formatted) for a ready NPC, or None."""
+        with self._cond:
+            entry = self._ready.popleft() if self._ready else None
+            self._cond.notify_all()
+            return entry
+
+    def stats(self):
+        with self._cond:
+            return {
+                "ready": len(self._ready),
+                "size": self.size,
+                "tokens_last_hour": self._tokens_in_window(time.monotonic()),
+                "token_budget": self.token_budget,
+            }
+
+    def _tokens_in_window(self, now):
+        while self._spent and now - self._spent[0][0] > BUDGET_WINDOW_SECONDS:
+            self._spent.popleft()
+        return sum(tokens for _, tokens in self._spent)
+
+    def _wait_for_room(self):
+        # Returns False once the pool is stopped.
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                if len(self._ready) >= self.size:
+                    self._cond.wait()
+                    continue
+                if self._tokens_in_window(now) < self.token_budget:
+                    return True
+                if not self._spent:
+                    self._cond.wait()
+                    continue
+                # Sleep until the oldest spend leaves the window.
+                self._cond.wait(
+                    self._spent[0][0] + BUDGET_WINDOW_SECONDS - now
+                )
+            self._thread = None
+            return False
+
+    def _run(self):
+        while self._wait_for_room():
+            spec = random_npc_spec()
+            trace = GenerationTrace(mode="prefetch")
+            with self._cond:
+                if not self._running:
+                    continue
+                token = self._token = CancelToken()
+            try:
+                data, formatted = self.generate(
+                    spec["race"],
+                    spec["char_class"],
+                    spec["subclass"],
+                    spec["level"],
+                    True,
+                    "",
+                    True,
+                    trace=trace,
+                    cancel=token
+                )
+            except Cancelled as e:
+                log_trace(trace, error=f"Cancelled: {e}")
+                with self._cond:
+                    self._record_spend(trace)
+                continue
+            except Exception as e:
+                log_trace(trace, error=f"{type(e).__name__}: {e}")
+                with self._cond:
+                    self._record_spend(trace)
+                    self._cond.wait(RETRY_DELAY_SECONDS)
+                continue
+
+            log_trace(trace)
+            with self._cond:
+                self._record_spend(trace)
+                if isinstance(data, dict):
+                    self._ready.append((spec, data, formatted))
+
+    def _record_spend(self, trace):
+        tokens = trace.tokens()["total_tokens"]
+        if tokens:
+            self._spent.append((time.monotonic(), tokens))
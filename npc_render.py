@@ -0,0 +1,358 @@
+"""Render Npc objects to text, Markdown, HTML or a wide two-column block.
+
+Each layout is a small template compiled once, on first use, into a
+Python function that appends string pieces for one NPC. Rendering then
+does no parsing, no lookups by name and no type checks; render_many()
+streams any number of NPCs through one reused buffer. Plain text is the
+exception: Npc.format_text() writes it out by hand and is faster than any
+compiled version of the same layout.
+
+Template syntax:
+
+    {field} or {field:spec}   a value (escaped for HTML/Markdown)
+    {?field} ... {/}           only when field is truthy
+    {#field} ... {/}           once per item of a list field; {.} is the item
+"""
+import html
+import re
+from itertools import zip_longest
+
+from npc_model import MISSING_SCORE, Npc
+from rules import ABILITIES, ability_modifier, format_modifier
+
+RENDER_CHUNK = 256
+COLUMN_WIDTH = 48
+COLUMN_GAP = 3
+
+_TAG = re.compile(r"\{([?#]?)([A-Za-z_][\w]*|\.)(?::([^{}]*))?\}|\{/\}")
+_MARKDOWN_SPECIAL = re.compile(r"[\\`*_\[\]|#<>]")
+
+
+def known(value):
+    return "?" if value is None else value
+
+
+def score(npc, index):
+    value = npc.abilities[index]
+    return "?" if value == MISSING_SCORE else str(value)
+
+
+def score_with_modifier(npc, index):
+    value = npc.abilities[index]
+    if value == MISSING_SCORE:
+        return "?"
+    return f"{value} ({format_modifier(ability_modifier(value))})"
+
+
+def header(npc):
+    return f"{npc.name} (Level {known(npc.level)} {npc.race} {npc.char_class})"
+
+
+def escape_markdown(text):
+    # Most values contain nothing to escape; finding that out is cheaper
+    # than rebuilding the string.
+    if _MARKDOWN_SPECIAL.search(text) is None:
+        return text
+    return _MARKDOWN_SPECIAL.sub(lambda match: "\\" + match.group(), text)
+
+
+# Template field -> Python expression over the NPC "n".
+FIELD_EXPRESSIONS = {
+    "name": "n.name",
+    "race": "n.race",
+    "class": "n.char_class",
+    "subclass": "n.subclass",
+    "level": "('?' if n.level is None else n.level)",
+    "hp": "('?' if n.hp is None else n.hp)",
+    "ac": "('?' if n.ac is None else n.ac)",
+    "speed": "('?' if n.speed is None else n.speed)",
+    "header": "header(n)",
+    "rule": "'-' * len(header(n))",
+    "has_subclass": "n.subclass and n.subclass.lower() != 'none'",
+    "has_prof": "n.proficiency_bonus is not None",
+    "prof": "format_modifier(n.proficiency_bonus)",
+    "abilities": "n.abilities is not None",
+    "saving_throws": "n.saving_throws",
+    "saves": "', '.join(n.saving_throws)",
+    "skills": "n.skills",
+    "skill_list": "', '.join(n.skills)",
+    "attacks": "n.attacks",
+    "spells": "n.spells",
+    "features": "n.features",
+}
+for _index, _ability in enumerate(ABILITIES):
+    FIELD_EXPRESSIONS[_ability.lower()] = f"score(n, {_index})"
+    FIELD_EXPRESSIONS[_ability.lower() + "_mod"] = f"score_with_modifier(n, {_index})"
+
+# Fields that are always digits, signs or "?" and never need escaping.
+SAFE_FIELDS = {"level", "hp", "ac", "prof", "rule"} | {
+    name for name in FIELD_EXPRESSIONS if name[:3].upper() in ABILITIES
+}
+
+_NAMESPACE = {
+    "score": score,
+    "score_with_modifier": score_with_modifier,
+    "header": header,
+    "format_modifier": format_modifier,
+}
+
+
+class Template:
+    """A layout compiled to a function; render(npc) returns the text."""
+
+    def __init__(self, source, escape=None, name="template"):
+        self.name = name
+        self.code = self.compile(source, escape is not None)
+        namespace = dict(_NAMESPACE, esc=escape)
+        exec(compile(self.code, f"<template {name}>", "exec"), namespace)
+        self.render_into = namespace["render_into"]
+
+    def compile(self, source, escaped):
+        # Consecutive text and values become a single "%" format and one
+        # a(...) call; a block's body gets "pass" only when it would
+        # otherwise be empty.
+        lines = ["def render_into(n, a):"]
+        depth = 1
+        loops = 0
+        block_starts = []
+        text = []
+        values = []
+
+        def emit(statement):
+            lines.append("    " * depth + statement)
+
+        def flush():
+            if values:
+                emit(f"a({''.join(text)!r} % ({', '.join(values)},))")
+            elif text:
+                emit(f"a({''.join(text).replace('%%', '%')!r})")
+            text.clear()
+            values.clear()
+
+        position = 0
+        for match in _TAG.finditer(source):
+            if match.start() > position:
+                text.append(source[position:match.start()].replace("%", "%%"))
+            position = match.end()
+
+            kind, field, spec = match.groups()
+            if field is None:
+                if not block_starts:
+                    raise ValueError(f"{self.name}: unmatched {{/}}")
+                flush()
+                if len(lines) == block_starts.pop():
+                    emit("pass")
+                depth -= 1
+                continue
+
+            if field == ".":
+                if not loops:
+                    raise ValueError(f"{self.name}: {{.}} outside a {{#list}} block")
+                expression = f"item{loops}"
+            elif field in FIELD_EXPRESSIONS:
+                expression = FIELD_EXPRESSIONS[field]
+            else:
+                raise ValueError(f"{self.name}: unknown field {field!r}")
+
+            if kind:
+                flush()
+                if kind == "?":
+                    emit(f"if {expression}:")
+                else:
+                    loops += 1
+                    emit(f"for item{loops} in {expression}:")
+                depth += 1
+                block_starts.append(len(lines))
+                continue
+
+            if spec:
+                expression = f"format({expression}, {spec!r})"
+            if escaped and field not in SAFE_FIELDS:
+                expression = f"esc(str({expression}))"
+            text.append("%s")
+            values.append(expression)
+
+        if position < len(source):
+            text.append(source[position:].replace("%", "%%"))
+        flush()
+        if block_starts:
+            raise ValueError(f"{self.name}: unclosed block")
+        if len(lines) == 1:
+            emit("pass")
+        return "\n".join(lines) + "\n"
+
+    def render(self, npc):
+        parts = []
+        self.render_into(npc, parts.append)
+        return "".join(parts)
+
+
+class ColumnTemplate:
+    """Two templates rendered side by side, line by line."""
+
+    def __init__(self, left, right, width=COLUMN_WIDTH, gap=COLUMN_GAP):
+        self.left = left
+        self.right = right
+        self.width = width
+        self.gap = " " * gap
+
+    def render_into(self, npc, a):
+        left = self.left.render(npc).splitlines()
+        right = self.right.render(npc).splitlines()
+        for left_line, right_line in zip_longest(left, right, fillvalue=""):
+            if right_line:
+                a(left_line.ljust(self.width) + self.gap + right_line + "\n")
+            else:
+                a(left_line + "\n")
+
+    def render(self, npc):
+        parts = []
+        self.render_into(npc, parts.append)
+        return "".join(parts)
+
+
+class TextLayout:
+    """The plain text layout, the same text as format_statblock()."""
+
+    def render_into(self, npc, a):
+        a(npc.format_text())
+
+    def render(self, npc):
+        return npc.format_text()
+
+
+MARKDOWN_TEMPLATE = (
+    "## {name}\n\n"
+    "*Level {level} {race} {class}{?has_subclass} ({subclass}){/}*\n\n"
+    "**HP** {hp} · **AC** {ac} · **Speed** {speed}"
+    "{?has_prof} · **Proficiency** {prof}{/}\n\n"
+    "{?abilities}| STR | DEX | CON | INT | WIS | CHA |\n"
+    "|---|---|---|---|---|---|\n"
+    "| {str_mod} | {dex_mod} | {con_mod} | {int_mod} | {wis_mod} | {cha_mod} |\n\n{/}"
+    "{?saving_throws}**Saving Throws** {saves}  \n{/}"
+    "{?skills}**Skills** {skill_list}  \n{/}"
+    "\n"
+    "{?attacks}### Attacks\n{#attacks}- {.}\n{/}\n{/}"
+    "{?spells}### Spells\n{#spells}- {.}\n{/}\n{/}"
+    "{?features}### Features\n{#features}- {.}\n{/}\n{/}"
+)
+
+HTML_TEMPLATE = (
+    '<section class="statblock">\n'
+    "<h2>{name}</h2>\n"
+    '<p class="subtitle">Level {level} {race} {class}{?has_subclass} ({subclass}){/}</p>\n'
+    '<p class="stats"><b>HP</b> {hp} <b>AC</b> {ac} <b>Speed</b> {speed}'
+    "{?has_prof} <b>Proficiency</b> {prof}{/}</p>\n"
+    '{?abilities}<table class="abilities">'
+    "<tr><th>STR</th><th>DEX</th><th>CON</th><th>INT</th><th>WIS</th><th>CHA</th></tr>"
+    "<tr><td>{str_mod}</td><td>{dex_mod}</td><td>{con_mod}</td>"
+    "<td>{int_mod}</td><td>{wis_mod}</td><td>{cha_mod}</td></tr></table>\n{/}"
+    "{?saving_throws}<p><b>Saving Throws</b> {saves}</p>\n{/}"
+    "{?skills}<p><b>Skills</b> {skill_list}</p>\n{/}"
+    "{?attacks}<h3>Attacks</h3>\n<ul>{#attacks}<li>{.}</li>{/}</ul>\n{/}"
+    "{?spells}<h3>Spells</h3>\n<ul>{#spells}<li>{.}</li>{/}</ul>\n{/}"
+    "{?features}<h3>Features</h3>\n<ul>{#features}<li>{.}</li>{/}</ul>\n{/}"
+    "</section>\n"
+)
+
+HTML_DOCUMENT_START = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>NPCs</title>
+<style>
+body { font-family: Georgia, serif; max-width: 48em; margin: 2em auto; }
+.statblock { border-top: 3px solid #7A200D; margin-bottom: 2em; }
+.subtitle { font-style: italic; margin-top: 0; }
+.abilities td, .abilities th { padding: 0 0.8em; text-align: center; }
+</style>
+</head>
+<body>
+"""
+
+COLUMN_LEFT_TEMPLATE = (
+    "{header}\n"
+    "{?has_subclass}Subclass: {subclass}\n{/}"
+    "{rule}\n"
+    "HP: {hp}   AC: {ac}   Speed: {speed}\n"
+    "{?has_prof}Proficiency: {prof}\n{/}"
+    "{?abilities}\n"
+    "STR {str:>2}  DEX {dex:>2}  CON {con:>2}\n"
+    "INT {int:>2}  WIS {wis:>2}  CHA {cha:>2}\n{/}"
+    "{?saving_throws}\nSaving Throws: {saves}\n{/}"
+    "{?skills}\nSkills:\n{#skills}  - {.}\n{/}{/}"
+)
+
+COLUMN_RIGHT_TEMPLATE = (
+    "{?attacks}Attacks:\n{#attacks}  - {.}\n{/}\n{/}"
+    "{?spells}Spells:\n{#spells}  - {.}\n{/}\n{/}"
+    "{?features}Features:\n{#features}  - {.}\n{/}{/}"
+)
+
+# name -> (build the template, document start, separator, document end)
+RENDER_FORMATS = {
+    "text": (
+        TextLayout,
+        "", "\n", "",
+    ),
+    "markdown": (
+        lambda: Template(MARKDOWN_TEMPLATE, escape_markdown, name="markdown"),
+        "# NPCs\n\n", "---\n\n", "",
+    ),
+    "html": (
+        lambda: Template(HTML_TEMPLATE, html.escape, name="html"),
+        HTML_DOCUMENT_START, "", "</body>\n</html>\n",
+    ),
+    "columns": (
+        lambda: ColumnTemplate(
+            Template(COLUMN_LEFT_TEMPLATE, name="columns-left"),
+            Template(COLUMN_RIGHT_TEMPLATE, name="columns-right")
+        ),
+        "", "\n", "",
+    ),
+}
+
+_compiled = {}
+
+
+def get_template(render_format):
+    template = _compiled.get(render_format)
+    if template is None:
+        if render_format not in RENDER_FORMATS:
+            raise ValueError(f"unknown render format {render_format!r}")
+        template = _compiled[render_format] = RENDER_FORMATS[render_format][0]()
+    return template
+
+
+def as_npc(npc):
+    return npc if isinstance(npc, Npc) else Npc.from_dict(npc)
+
+
+def render(npc, render_format="text"):
+    """Render one Npc (or statblock dict)."""
+    return get_template(render_format).render(as_npc(npc))
+
+
+def render_many(npcs, out, render_format="text", chunk=RENDER_CHUNK):
+    """Write every NPC to the text file out as one document; return the count.
+
+    Pieces of up to chunk NPCs are joined and written at once, so the
+    file sees few large writes and no per-NPC string is built.
+    """
+    render_into = get_template(render_format).render_into
+    start, separator, end = RENDER_FORMATS[render_format][1:]
+
+    parts = [start]
+    append = parts.append
+    count = 0
+    for npc in npcs:
+        if count and separator:
+            append(separator)
+        render_into(as_npc(npc), append)
+        count += 1
+        if count % chunk == 0:
+            out.write("".join(parts))
+            parts.clear()
+    append(end)
+    out.write("".join(parts))
+    return count
@@ -0,0 +1,363 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from npc_cancel import CancelToken, current_token
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 8.0
+DEFAULT_ATTEMPT_TIMEOUT = 60.0
+DEFAULT_DEADLINE = 150.0
+DEFAULT_MIN_HEDGE_DELAY = 2.0
+
+# Latencies kept per request kind, and how many are needed before the
+# observed p95 is trusted as a hedging threshold.
+LATENCY_WINDOW = 200
+MIN_HEDGE_SAMPLES = 20
+
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+class AttemptTimeout(TimeoutError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT,
+        deadline=DEFAULT_DEADLINE,
+        hedge=False,
+        min_hedge_delay=DEFAULT_MIN_HEDGE_DELAY
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+
+    def backoff(self, attempt):
+        # "Full jitter": spreads retries from many clients over the window.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class RequestStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = {}
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+
+    def record_latency(self, label, seconds):
+        with self._lock:
+            samples = self._latencies.get(label)
+            if samples is None:
+                samples = self._latencies[label] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def percentile(self, label, fraction):
+        with self._lock:
+            samples = sorted(self._latencies.get(label, ()))
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        return samples[round(fraction * (len(samples) - 1))]
+
+    def hedge_delay(self, label, policy):
+        p95 = self.percentile(label, 0.95)
+        if p95 is None:
+            return None
+        return max(p95, policy.min_hedge_delay)
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "deadlines_exceeded": self.deadlines_exceeded,
+            }
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, openai.APIConnectionError)
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(float(headers.get("retry-after", 0)), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _next_delay(error, attempt, policy, stats, deadline):
+    if not is_retryable(error) or attempt >= policy.max_attempts:
+        raise error
+
+    delay = max(policy.backoff(attempt), retry_after(error))
+    if time.monotonic() + delay >= deadline:
+        stats.count("deadlines_exceeded")
+        raise DeadlineExceeded(
+            f"gave up after {attempt} attempt(s) and {policy.deadline:g}s: {error}"
+        ) from error
+
+    stats.count("retries")
+    return delay
+
+
+def get_hedge_executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=8,
+                thread_name_prefix="npc-request"
+            )
+        return _hedge_executor
+
+
+def _timed_call(call, timeout, stats, label):
+    started = time.monotonic()
+    stats.count("attempts")
+    result = call(timeout)
+    stats.record_latency(label, time.monotonic() - started)
+    return result
+
+
+def _run_attempt(call, timeout, attempt_token, parent):
+    # Each hedged attempt has its own token, so the loser can be stopped
+    # (its stream closed) without touching the winner; a cancel of the
+    # whole generation still reaches both.
+    with parent.on_cancel(attempt_token.cancel) if parent else nullcontext():
+        with attempt_token.activate():
+            return call(timeout)
+
+
+def _stop_attempts(attempt_tokens):
+    # A streamed attempt that lost (or outlived the call) would otherwise
+    # keep generating tokens and hold a pooled connection until it ends.
+    # Finished attempts ignore the cancel.
+    for attempt_token in attempt_tokens:
+        attempt_token.cancel("hedged attempt no longer needed")
+
+
+def _hedged_call(call, timeout, policy, stats, label):
+    import contextvars
+    from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+    delay = stats.hedge_delay(label, policy)
+    if delay is None or delay >= timeout:
+        return _timed_call(call, timeout, stats, label)
+
+    executor = get_hedge_executor()
+    started = time.monotonic()
+    stop_at = started + timeout
+
+    # Completed by a cancel, so the waits below wake up at once.
+    token = current_token()
+    woken = Future()
+    attempt_tokens = []
+
+    def submit(attempt_timeout):
+        stats.count("attempts")
+        attempt_token = CancelToken()
+        attempt_tokens.append(attempt_token)
+        return executor.submit(
+            contextvars.copy_context().run,
+            _run_attempt, call, attempt_timeout, attempt_token, token
+        )
+
+    try:
+        primary = submit(timeout)
+        pending = {primary}
+        with token.on_cancel(lambda: woken.set_result(None)) if token else nullcontext():
+            done, _ = wait(pending | {woken}, timeout=delay, return_when=FIRST_COMPLETED)
+            if token is not None:
+                token.check()
+            if not done:
+                stats.count("hedges")
+                pending.add(submit(timeout - delay))
+
+            error = None
+            while pending:
+                done, pending = wait(
+                    pending | {woken},
+                    timeout=max(stop_at - time.monotonic(), 0),
+                    return_when=FIRST_COMPLETED
+                )
+                if token is not None:
+                    token.check()
+                pending.discard(woken)
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        if future is not primary:
+                            stats.count("hedge_wins")
+                        stats.record_latency(label, time.monotonic() - started)
+                        return future.result()
+                    error = future.exception()
+    finally:
+        _stop_attempts(attempt_tokens)
+
+    if error is not None and not pending:
+        raise error
+    raise AttemptTimeout(f"no response within {timeout:.1f}s")
+
+
+def call_with_retries(call, policy, stats, label="request", hedge=None):
+    """Run call(timeout) until it succeeds, fails for good or runs out of time.
+
+    call gets the timeout for that attempt. Retryable errors (timeouts,
+    connection errors, 408/409/429 and 5xx) are retried with jittered
+    exponential backoff until policy.max_attempts or policy.deadline is
+    reached. With hedging, a duplicate call is started when an attempt
+    runs past the p95 latency observed for label, and the first answer wins.
+    """
+    if hedge is None:
+        hedge = policy.hedge
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    # An active CancelToken stops the retries, interrupts the backoff and
+    # caps every attempt at the generation's own hard timeout.
+    token = current_token()
+
+    while True:
+        timeout = min(policy.attempt_timeout, deadline - time.monotonic())
+        if token is not None:
+            token.check()
+            if token.deadline is not None:
+                timeout = min(timeout, token.remaining())
+        try:
+            if hedge:
+                return _hedged_call(call, timeout, policy, stats, label)
+            return _timed_call(call, timeout, stats, label)
+        except Exception as error:
+            if token is None:
+                attempt += 1
+                time.sleep(_next_delay(error, attempt, policy, stats, deadline))
+                continue
+            # A cancel closes the connection, which surfaces here as a
+            # connection error; report the cancel instead.
+            token.check()
+            attempt += 1
+            token.sleep(_next_delay(error, attempt, policy, stats, deadline))
+
+
+async def _atimed_call(call, timeout, stats, label):
+    import asyncio
+
+    started = time.monotonic()
+    stats.count("attempts")
+    try:
+        result = await asyncio.wait_for(call(timeout), timeout)
+    except asyncio.TimeoutError:
+        raise AttemptTimeout(f"no response within {timeout:.1f}s")
+    stats.record_latency(label, time.monotonic() - started)
+    return result
+
+
+async def _ahedged_call(call, timeout, policy, stats, label):
+    import asyncio
+
+    delay = stats.hedge_delay(label, policy)
+    if delay is None or delay >= timeout:
+        return await _atimed_call(call, timeout, stats, label)
+
+    started = time.monotonic()
+    stop_at = started + timeout
+
+    stats.count("attempts")
+    primary = asyncio.ensure_future(call(timeout))
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            stats.count("attempts")
+            stats.count("hedges")
+            pending.add(asyncio.ensure_future(call(timeout - delay)))
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=max(stop_at - time.monotonic(), 0),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        stats.count("hedge_wins")
+                    stats.record_latency(label, time.monotonic() - started)
+                    return task.result()
+                error = task.exception()
+
+        if error is not None and not pending:
+            raise error
+        raise AttemptTimeout(f"no response within {timeout:.1f}s")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def acall_with_retries(call, policy, stats, label="request", hedge=None):
+    """Async variant of call_with_retries; call(timeout) returns an awaitable.
+
+    Unlike the threaded version, a losing hedged request is cancelled.
+    """
+    import asyncio
+
+    if hedge is None:
+        hedge = policy.hedge
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+
+    while True:
+        timeout = min(policy.attempt_timeout, deadline - time.monotonic())
+        try:
+            if hedge:
+                return await _ahedged_call(call, timeout, policy, stats, label)
+            return await _atimed_call(call, timeout, stats, label)
+        except Exception as error:
+            attempt += 1
+            await asyncio.sleep(_next_delay(error, attempt, policy, stats, deadline))
@@ -0,0 +1,214 @@
+import json
+import re
+
+from rules import ABILITIES
+
+ABILITY_FIELDS = {ability: int for ability in ABILITIES}
+
+STATBLOCK_FIELDS = {
+    "name": str,
+    "race": str,
+    "class": str,
+    "subclass": str,
+    "level": int,
+    "spells": [str],
+    "hp": int,
+    "ac": int,
+    "speed": str,
+    "abilities": ABILITY_FIELDS,
+    "saving_throws": [str],
+    "skills": [str],
+    "attacks": [str],
+    "features": [str],
+}
+
+# Fields the model still writes when the rules engine supplies the mechanics.
+FLAVOR_FIELDS = {
+    key: STATBLOCK_FIELDS[key]
+    for key in ("name", "spells", "skills", "attacks", "features")
+}
+
+SPELL_WITH_SUMMARY = {"name": str, "summary": str}
+
+ABILITY_ALIASES = {
+    "STRENGTH": "STR",
+    "DEXTERITY": "DEX",
+    "CONSTITUTION": "CON",
+    "INTELLIGENCE": "INT",
+    "WISDOM": "WIS",
+    "CHARISMA": "CHA",
+}
+
+_LEADING_INT = re.compile(r"^\s*([-+]?\d+)")
+_PROBLEM_FIELD = re.compile(r"^[^.\[:]+")
+
+
+def fields_with_summaries(fields):
+    if "spells" not in fields:
+        return fields
+    result = dict(fields)
+    result["spells"] = [SPELL_WITH_SUMMARY]
+    return result
+
+
+def example_value(field_type):
+    if field_type is str:
+        return "string"
+    if field_type is int:
+        return 0
+    if isinstance(field_type, list):
+        return [example_value(field_type[0])]
+    return {key: example_value(value) for key, value in field_type.items()}
+
+
+def schema_text(fields):
+    lines = ["{"]
+    items = list(fields.items())
+    for index, (key, field_type) in enumerate(items):
+        comma = "," if index < len(items) - 1 else ""
+        if isinstance(field_type, dict):
+            lines.append(f'  "{key}": {{')
+            nested = list(field_type.items())
+            for n_index, (n_key, n_type) in enumerate(nested):
+                n_comma = "," if n_index < len(nested) - 1 else ""
+                lines.append(
+                    f'    "{n_key}": {json.dumps(example_value(n_type))}{n_comma}'
+                )
+            lines.append("  }" + comma)
+        else:
+            lines.append(
+                f'  "{key}": {json.dumps(example_value(field_type))}{comma}'
+            )
+    lines.append("}")
+    return "\n" + "\n".join(lines) + "\n"
+
+
+def json_schema(field_type):
+    if field_type is str:
+        return {"type": "string"}
+    if field_type is int:
+        return {"type": "integer"}
+    if isinstance(field_type, list):
+        return {"type": "array", "items": json_schema(field_type[0])}
+    return {
+        "type": "object",
+        "properties": {key: json_schema(value) for key, value in field_type.items()},
+        "required": list(field_type),
+        "additionalProperties": False,
+    }
+
+
+def response_format(fields, name):
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": json_schema(fields),
+        },
+    }
+
+
+def _coerce_int(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        match = _LEADING_INT.match(value)
+        if match:
+            return int(match.group(1))
+        return None
+    if isinstance(value, dict):
+        for key in ("score", "value", "total", "average"):
+            if key in value:
+                return _coerce_int(value[key])
+    return None
+
+
+def _coerce_str(value):
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list):
+        return ", ".join(_coerce_str(v) for v in value)
+    if isinstance(value, dict):
+        name = value.get("name")
+        description = value.get("description") or value.get("desc")
+        if name and description:
+            return f"{name}: {description}"
+        if name:
+            return str(name)
+        return json.dumps(value)
+    return str(value)
+
+
+def _repair(value, field_type, path, problems):
+    if field_type is int:
+        coerced = _coerce_int(value)
+        if coerced is None:
+            problems.append(f"{path}: expected an integer, got {value!r}")
+            return value
+        return coerced
+
+    if field_type is str:
+        return _coerce_str(value)
+
+    if isinstance(field_type, list):
+        if value is None:
+            return []
+        if isinstance(value, (str, dict)):
+            value = [value]
+        if not isinstance(value, list):
+            problems.append(f"{path}: expected a list, got {value!r}")
+            return value
+        return [
+            _repair(item, field_type[0], f"{path}[{index}]", problems)
+            for index, item in enumerate(value)
+        ]
+
+    if not isinstance(value, dict):
+        problems.append(f"{path}: expected an object, got {value!r}")
+        return value
+
+    repaired = {}
+    for key, item in value.items():
+        key = str(key).strip()
+        if field_type is ABILITY_FIELDS:
+            key = ABILITY_ALIASES.get(key.upper(), key.upper())
+        repaired[key] = item
+    for key, item_type in field_type.items():
+        if key not in repaired:
+            problems.append(f"{path}.{key}: missing")
+            continue
+        repaired[key] = _repair(repaired[key], item_type, f"{path}.{key}", problems)
+    return repaired
+
+
+def validate_and_repair(data, fields):
+    """Check and coerce a parsed statblock in one pass.
+
+    Returns (repaired, problems). Fixable issues ("15" -> 15, ability
+    scores nested as {"score": 15}, a bare string where a list belongs) are
+    repaired silently; problems lists what could not be fixed, including
+    missing fields. Keys that are not in fields are kept unchanged.
+    """
+    problems = []
+    repaired = dict(data)
+    for key, field_type in fields.items():
+        if key not in data:
+            problems.append(f"{key}: missing")
+            continue
+        repaired[key] = _repair(data[key], field_type, key, problems)
+    return repaired, problems
+
+
+def problem_fields(problems, fields):
+    """Top-level fields named by validate_and_repair problems, in field order."""
+    named = {_PROBLEM_FIELD.match(problem).group() for problem in problems}
+    return [key for key in fields if key in named]
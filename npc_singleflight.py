@@ -0,0 +1,136 @@
+import copy
+import threading
+from contextlib import nullcontext
+
+from npc_cancel import Cancelled, current_token
+from npc_metrics import annotate, stage
+
+
+class SingleFlight:
+    """Share one call among concurrent callers that ask for the same key.
+
+    The first caller for a key runs it; callers that arrive while it is in
+    flight wait and get a copy of its result, or its exception. If the
+    running call is cancelled, the waiting callers start over rather than
+    fail with someone else's cancellation. Keys start with a label
+    ("statblock", "spell_summaries") that the counters are grouped by.
+
+    A caller that passes join=False never waits on another caller's call:
+    it leads a new one if none is in flight and otherwise runs its own,
+    unshared. Streaming callers use this, since a joined call delivers no
+    partial results.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+        self._counts = {}
+
+    def _count(self, key, leader):
+        counts = self._counts.setdefault(key[0], {"calls": 0, "coalesced": 0})
+        counts["calls" if leader else "coalesced"] += 1
+
+    def _land(self, flights, key, future, result=None, error=None):
+        # Unregister first, so a caller arriving now starts a new call
+        # instead of joining a finished one.
+        with self._lock:
+            if flights.get(key) is future:
+                del flights[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func, join=True):
+        from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+        while True:
+            with self._lock:
+                future = self._flights.get(key)
+                leader = future is None
+                if leader:
+                    future = self._flights[key] = Future()
+                self._count(key, leader or not join)
+
+            if not leader and not join:
+                return func()
+
+            if leader:
+                try:
+                    result = func()
+                except BaseException as error:
+                    self._land(self._flights, key, future, error=error)
+                    raise
+                self._land(self._flights, key, future, result=result)
+                return result
+
+            # Completed by our own cancel, so the wait below wakes up at once.
+            token = current_token()
+            woken = Future()
+            annotate(coalesced=True)
+            with stage(f"coalesced:{key[0]}"):
+                with token.on_cancel(lambda: woken.set_result(None)) if token else nullcontext():
+                    wait((future, woken), return_when=FIRST_COMPLETED)
+            if token is not None:
+                token.check()
+
+            error = future.exception()
+            if isinstance(error, Cancelled):
+                continue
+            if error is not None:
+                raise error
+            return copy.deepcopy(future.result())
+
+    async def ado(self, key, factory):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                future = self._async_flights.get(key)
+                leader = future is None or future.get_loop() is not loop
+                if leader:
+                    future = self._async_flights[key] = loop.create_future()
+                self._count(key, leader)
+
+            if leader:
+                try:
+                    result = await factory()
+                except asyncio.CancelledError:
+                    self._land(
+                        self._async_flights,
+                        key,
+                        future,
+                        error=Cancelled("shared request was cancelled")
+                    )
+                    future.exception()
+                    raise
+                except BaseException as error:
+                    self._land(self._async_flights, key, future, error=error)
+                    # Nobody may be waiting; do not log it as never retrieved.
+                    future.exception()
+                    raise
+                self._land(self._async_flights, key, future, result=result)
+                return result
+
+            # asyncio.wait() leaves the shared future alone if we are cancelled.
+            annotate(coalesced=True)
+            with stage(f"coalesced:{key[0]}"):
+                await asyncio.wait((future,))
+
+            error = future.exception()
+            if isinstance(error, Cancelled):
+                continue
+            if error is not None:
+                raise error
+            return copy.deepcopy(future.result())
+
+    def snapshot(self):
+        with self._lock:
+            labels = {label: dict(counts) for label, counts in self._counts.items()}
+        return {
+            "calls": sum(counts["calls"] for counts in labels.values()),
+            "coalesced": sum(counts["coalesced"] for counts in labels.values()),
+            "labels": labels,
+        }
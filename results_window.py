@@ -0,0 +1,255 @@
+import json
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from npc_render import render
+
+RESULT_POLL_MS = 100
+# Rows inserted per poll, so a huge file never blocks the event loop.
+APPEND_CHUNK = 500
+READ_CHUNK = 500
+FOLLOW_INTERVAL_SECONDS = 0.5
+
+COLUMNS = (
+    ("index", "#", 50),
+    ("name", "Name", 170),
+    ("race", "Race", 80),
+    ("class", "Class", 80),
+    ("subclass", "Subclass", 130),
+    ("level", "Level", 45),
+    ("status", "Status", 60),
+)
+
+
+def batch_result(record):
+    """(data, statblock, error) for one line of a batch output file."""
+    data = record.get("npc") if isinstance(record.get("npc"), dict) else None
+    error = record.get("error")
+    if data is None and error is None:
+        error = "no NPC in this record"
+    return data, record.get("statblock") or "", error
+
+
+def follow_batch_file(path, results, stop):
+    # Read complete lines as they are written (a running "Main.py batch"
+    # flushes one per NPC) until stop is set.
+    buffered = ""
+    try:
+        with open(path, encoding="utf-8") as f:
+            while not stop.is_set():
+                chunk = []
+                for line in f:
+                    if not line.endswith("\n"):
+                        buffered += line
+                        break
+                    line, buffered = buffered + line, ""
+                    if not line.strip():
+                        continue
+                    try:
+                        chunk.append(batch_result(json.loads(line)))
+                    except (json.JSONDecodeError, AttributeError) as e:
+                        chunk.append((None, "", f"unreadable line: {e}"))
+                    if len(chunk) >= READ_CHUNK:
+                        results.put(chunk)
+                        chunk = []
+                if chunk:
+                    results.put(chunk)
+                    continue
+                stop.wait(FOLLOW_INTERVAL_SECONDS)
+    except OSError as e:
+        results.put([(None, "", f"Could not read {path}: {e}")])
+
+
+class ResultsWindow(tk.Toplevel):
+    """Browse many NPCs: a list of summaries plus the selected statblock.
+
+    Only the selected NPC is ever put into the Text widget. append() may be
+    called from any thread; rows are added in chunks from the Tk loop, so
+    results keep streaming in while the list stays responsive.
+    """
+
+    def __init__(self, master, title, on_open, dark=True):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("980x560")
+        self.minsize(640, 320)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.on_open = on_open
+        self.records = []
+        self.failed = 0
+        self.following = None
+        self._incoming = queue.Queue()
+        self._pending = []
+        self._stop = threading.Event()
+
+        panes = ttk.PanedWindow(self, orient="horizontal")
+        panes.grid(row=0, column=0, sticky="nsew", padx=10, pady=(10, 4))
+
+        list_frame = ttk.Frame(panes, style="App.TFrame")
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(0, weight=1)
+        self.tree = ttk.Treeview(
+            list_frame,
+            columns=[key for key, _, _ in COLUMNS],
+            show="headings",
+            selectmode="browse"
+        )
+        for key, heading, width in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor="w", stretch=key == "name")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        tree_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        tree_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=tree_scrollbar.set)
+        self.tree.tag_configure("error", foreground="#D9534F")
+        panes.add(list_frame, weight=1)
+
+        detail_frame = ttk.Frame(panes, style="App.TFrame")
+        detail_frame.columnconfigure(0, weight=1)
+        detail_frame.rowconfigure(0, weight=1)
+        self.detail_text = tk.Text(
+            detail_frame,
+            width=60,
+            state="disabled",
+            wrap="word",
+            font="TkFixedFont"
+        )
+        self.detail_text.grid(row=0, column=0, sticky="nsew")
+        detail_scrollbar = ttk.Scrollbar(
+            detail_frame, orient="vertical", command=self.detail_text.yview
+        )
+        detail_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.detail_text.configure(yscrollcommand=detail_scrollbar.set)
+        panes.add(detail_frame, weight=1)
+
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(
+            self,
+            textvariable=self.status_var,
+            anchor="w",
+            padding=(10, 4),
+            style="App.TLabel"
+        ).grid(row=1, column=0, sticky="ew")
+
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Double-1>", self.on_activate)
+        self.tree.bind("<Return>", self.on_activate)
+        self.bind("<Escape>", lambda event: self.destroy())
+        self.bind("<Destroy>", self.on_destroy)
+
+        self.apply_theme(dark)
+        self.update_status()
+        self._poll_after_id = self.after(RESULT_POLL_MS, self.poll)
+
+    def apply_theme(self, dark):
+        self.configure(bg="#1E1E1E" if dark else "#FFFFFF")
+        if dark:
+            self.detail_text.configure(bg="#1E1E1E", fg="#F5F5F5", insertbackground="#F5F5F5")
+        else:
+            self.detail_text.configure(bg="#FFFFFF", fg="#000000", insertbackground="#000000")
+
+    def follow(self, path):
+        """Load a batch output file and keep appending as it grows."""
+        self.following = path
+        threading.Thread(
+            target=follow_batch_file,
+            args=(path, self._incoming, self._stop),
+            name="npc-results-reader",
+            daemon=True
+        ).start()
+        self.update_status()
+
+    def append(self, data, statblock="", error=None):
+        self._incoming.put([(data, statblock, error)])
+
+    def poll(self):
+        while True:
+            try:
+                self._pending.extend(self._incoming.get_nowait())
+            except queue.Empty:
+                break
+
+        if self._pending:
+            chunk = self._pending[:APPEND_CHUNK]
+            del self._pending[:APPEND_CHUNK]
+            self.insert_rows(chunk)
+
+        self._poll_after_id = self.after(RESULT_POLL_MS, self.poll)
+
+    def insert_rows(self, rows):
+        # Keep the newest row in view only if the user is already at the end.
+        at_end = self.tree.yview()[1] >= 0.999
+        for data, statblock, error in rows:
+            index = len(self.records)
+            self.records.append((data, statblock, error))
+            if error is not None:
+                self.failed += 1
+            npc = data or {}
+            self.tree.insert(
+                "",
+                tk.END,
+                iid=str(index),
+                values=(
+                    index + 1,
+                    npc.get("name", ""),
+                    npc.get("race", ""),
+                    npc.get("class", ""),
+                    npc.get("subclass", ""),
+                    npc.get("level", ""),
+                    "error" if error is not None else "ok",
+                ),
+                tags=("error",) if error is not None else ()
+            )
+        if at_end:
+            self.tree.yview_moveto(1.0)
+        self.update_status()
+
+    def update_status(self):
+        text = f"{len(self.records)} NPCs"
+        if self.failed:
+            text += f" ({self.failed} failed)"
+        if self._pending:
+            text += f", {len(self._pending)} more loading"
+        if self.following:
+            text += f". Following {self.following}"
+        self.status_var.set(text + ". Double-click or Enter opens the NPC in the main window.")
+
+    def selected_record(self):
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        return self.records[int(selection[0])]
+
+    def on_select(self, event=None):
+        record = self.selected_record()
+        if record is None:
+            return
+        data, statblock, error = record
+        if error is not None:
+            text = f"Error: {error}"
+        elif not statblock:
+            # Rendered on demand; nothing is kept for rows never viewed.
+            text = render(data)
+        else:
+            text = statblock
+
+        self.detail_text.config(state="normal")
+        self.detail_text.delete("1.0", tk.END)
+        self.detail_text.insert(tk.END, text)
+        self.detail_text.config(state="disabled")
+
+    def on_activate(self, event=None):
+        record = self.selected_record()
+        if record is not None and record[0] is not None:
+            data, statblock, error = record
+            self.on_open(data, statblock or render(data))
+        return "break"
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self._stop.set()
+            self.after_cancel(self._poll_after_id)
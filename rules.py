@@ -0,0 +1,224 @@
+ABILITIES = ("STR", "DEX", "CON", "INT", "WIS", "CHA")
+
+ABILITY_ARRAYS = {
+    "standard": (15, 14, 13, 12, 10, 8),
+    "point_buy": (15, 15, 15, 8, 8, 8),
+}
+
+HIT_DIE = {
+    "Barbarian": 12,
+    "Bard": 8,
+    "Cleric": 8,
+    "Druid": 8,
+    "Fighter": 10,
+    "Monk": 8,
+    "Paladin": 10,
+    "Ranger": 10,
+    "Rogue": 8,
+    "Sorcerer": 6,
+    "Warlock": 8,
+    "Wizard": 6,
+}
+
+SAVING_THROWS = {
+    "Barbarian": ("STR", "CON"),
+    "Bard": ("DEX", "CHA"),
+    "Cleric": ("WIS", "CHA"),
+    "Druid": ("INT", "WIS"),
+    "Fighter": ("STR", "CON"),
+    "Monk": ("STR", "DEX"),
+    "Paladin": ("WIS", "CHA"),
+    "Ranger": ("STR", "DEX"),
+    "Rogue": ("DEX", "INT"),
+    "Sorcerer": ("CON", "CHA"),
+    "Warlock": ("WIS", "CHA"),
+    "Wizard": ("INT", "WIS"),
+}
+
+# Order in which the ability array is assigned (best score first).
+ABILITY_PRIORITY = {
+    "Barbarian": ("STR", "CON", "DEX", "WIS", "CHA", "INT"),
+    "Bard": ("CHA", "DEX", "CON", "WIS", "INT", "STR"),
+    "Cleric": ("WIS", "CON", "STR", "CHA", "INT", "DEX"),
+    "Druid": ("WIS", "CON", "DEX", "INT", "CHA", "STR"),
+    "Fighter": ("STR", "CON", "DEX", "WIS", "CHA", "INT"),
+    "Monk": ("DEX", "WIS", "CON", "STR", "INT", "CHA"),
+    "Paladin": ("STR", "CHA", "CON", "WIS", "DEX", "INT"),
+    "Ranger": ("DEX", "WIS", "CON", "STR", "INT", "CHA"),
+    "Rogue": ("DEX", "CON", "INT", "WIS", "CHA", "STR"),
+    "Sorcerer": ("CHA", "CON", "DEX", "WIS", "INT", "STR"),
+    "Warlock": ("CHA", "CON", "DEX", "WIS", "INT", "STR"),
+    "Wizard": ("INT", "CON", "DEX", "WIS", "CHA", "STR"),
+}
+
+RACIAL_BONUSES = {
+    "Human": {"STR": 1, "DEX": 1, "CON": 1, "INT": 1, "WIS": 1, "CHA": 1},
+    "Elf": {"DEX": 2},
+    "Dwarf": {"CON": 2},
+    "Halfling": {"DEX": 2},
+    "Gnome": {"INT": 2},
+    "Half-Elf": {"CHA": 2},
+    "Half-Orc": {"STR": 2, "CON": 1},
+    "Tiefling": {"CHA": 2, "INT": 1},
+    "Dragonborn": {"STR": 2, "CHA": 1},
+}
+
+# Half-elves also get +1 to two abilities of their choice.
+FLEXIBLE_RACIAL_BONUSES = {
+    "Half-Elf": 2,
+}
+
+RACE_SPEED = {
+    "Dwarf": 25,
+    "Halfling": 25,
+    "Gnome": 25,
+}
+DEFAULT_SPEED = 30
+
+ASI_LEVELS = {
+    "Fighter": (4, 6, 8, 12, 14, 16, 19),
+    "Rogue": (4, 8, 10, 12, 16, 19),
+}
+DEFAULT_ASI_LEVELS = (4, 8, 12, 16, 19)
+
+# (name, attack ability, damage dice, damage type)
+CLASS_WEAPONS = {
+    "Barbarian": ("Greataxe", "STR", "1d12", "slashing"),
+    "Bard": ("Rapier", "DEX", "1d8", "piercing"),
+    "Cleric": ("Mace", "STR", "1d6", "bludgeoning"),
+    "Druid": ("Scimitar", "DEX", "1d6", "slashing"),
+    "Fighter": ("Longsword", "STR", "1d8", "slashing"),
+    "Monk": ("Unarmed Strike", "DEX", "1d6", "bludgeoning"),
+    "Paladin": ("Longsword", "STR", "1d8", "slashing"),
+    "Ranger": ("Longbow", "DEX", "1d8", "piercing"),
+    "Rogue": ("Shortsword", "DEX", "1d6", "piercing"),
+    "Sorcerer": ("Dagger", "DEX", "1d4", "piercing"),
+    "Warlock": ("Dagger", "DEX", "1d4", "piercing"),
+    "Wizard": ("Dagger", "DEX", "1d4", "piercing"),
+}
+
+
+def ability_modifier(score):
+    return (score - 10) // 2
+
+
+def proficiency_bonus(level):
+    return 2 + (level - 1) // 4
+
+
+def format_modifier(value):
+    return f"+{value}" if value >= 0 else str(value)
+
+
+def ability_scores(race, char_class, level, method="standard"):
+    priority = ABILITY_PRIORITY.get(char_class, ABILITIES)
+    scores = dict(zip(priority, ABILITY_ARRAYS[method]))
+
+    for ability, bonus in RACIAL_BONUSES.get(race, {}).items():
+        scores[ability] += bonus
+
+    flexible = FLEXIBLE_RACIAL_BONUSES.get(race, 0)
+    for ability in priority:
+        if flexible == 0:
+            break
+        if ability not in RACIAL_BONUSES.get(race, {}):
+            scores[ability] += 1
+            flexible -= 1
+
+    asi_levels = ASI_LEVELS.get(char_class, DEFAULT_ASI_LEVELS)
+    for _ in range(sum(1 for lvl in asi_levels if lvl <= level)):
+        points = 2
+        for ability in priority:
+            while points and scores[ability] < 20:
+                scores[ability] += 1
+                points -= 1
+            if not points:
+                break
+
+    return {ability: scores[ability] for ability in ABILITIES}
+
+
+def hit_points(char_class, level, con_score):
+    die = HIT_DIE.get(char_class, 8)
+    con_mod = ability_modifier(con_score)
+    hp = die + (die // 2 + 1) * (level - 1) + con_mod * level
+    return max(hp, level)
+
+
+def armor_class(char_class, subclass, abilities):
+    dex = ability_modifier(abilities["DEX"])
+    if char_class == "Barbarian":
+        return 10 + dex + ability_modifier(abilities["CON"])
+    if char_class == "Monk":
+        return 10 + dex + ability_modifier(abilities["WIS"])
+    if char_class in ("Fighter", "Paladin"):
+        return 16 + 2
+    if char_class == "Cleric":
+        return 14 + min(dex, 2) + 2
+    if char_class == "Druid":
+        return 12 + min(dex, 2) + 2
+    if char_class in ("Sorcerer", "Wizard"):
+        if subclass == "Draconic Bloodline":
+            return 13 + dex
+        return 10 + dex
+    return 11 + dex
+
+
+def saving_throws(char_class, abilities, prof):
+    result = []
+    for ability in SAVING_THROWS.get(char_class, ()):
+        bonus = ability_modifier(abilities[ability]) + prof
+        result.append(f"{ability} {format_modifier(bonus)}")
+    return result
+
+
+def default_attack(char_class, abilities, prof):
+    weapon = CLASS_WEAPONS.get(char_class)
+    if weapon is None:
+        return None
+    name, ability, dice, damage_type = weapon
+    mod = ability_modifier(abilities[ability])
+    return (
+        f"{name}: {format_modifier(mod + prof)} to hit, "
+        f"{dice}{format_modifier(mod) if mod else ''} {damage_type}"
+    )
+
+
+def compute_mechanics(race, char_class, subclass, level, method="standard"):
+    level = max(1, min(int(level), 20))
+    abilities = ability_scores(race, char_class, level, method)
+    prof = proficiency_bonus(level)
+
+    return {
+        "race": race,
+        "class": char_class,
+        "subclass": subclass,
+        "level": level,
+        "hp": hit_points(char_class, level, abilities["CON"]),
+        "ac": armor_class(char_class, subclass, abilities),
+        "speed": f"{RACE_SPEED.get(race, DEFAULT_SPEED)} ft.",
+        "proficiency_bonus": prof,
+        "abilities": abilities,
+        "saving_throws": saving_throws(char_class, abilities, prof),
+    }
+
+
+def mechanics_summary(mechanics):
+    abilities = ", ".join(
+        f"{ability} {score} ({format_modifier(ability_modifier(score))})"
+        for ability, score in mechanics["abilities"].items()
+    )
+    return (
+        f"HP {mechanics['hp']}, AC {mechanics['ac']}, "
+        f"speed {mechanics['speed']}, "
+        f"proficiency bonus {format_modifier(mechanics['proficiency_bonus'])}, "
+        f"abilities: {abilities}, "
+        f"saving throws: {', '.join(mechanics['saving_throws'])}"
+    )
+
+
+def offline_statblock(race, char_class, subclass, level):
+    data = compute_mechanics(race, char_class, subclass, level)
+    attack = default_attack(char_class, data["abilities"], data["proficiency_bonus"])
+    data["attacks"] = [attack] if attack else []
+    return data